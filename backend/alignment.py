@@ -1,3 +1,90 @@
+import os
+import re
+import random
+import time
+from itertools import groupby
+import numpy as np
+
+try:
+    import numba
+except ImportError:  # optional: enables the compiled "numba" backend
+    numba = None
+
+# Traceback directions for the NumPy engines (one byte per DP cell);
+# STOP marks where a local alignment starts
+DIAG, UP, LEFT, STOP = 0, 1, 2, 3
+
+# Above this many DP cells needleman_wunsch_numpy switches to the linear-memory
+# Hirschberg mode (the full direction matrix costs one byte per cell)
+LINEAR_MEMORY_CELLS = int(os.getenv("ALIGNMENT_LINEAR_MEMORY_CELLS", "20000000"))
+
+# Bytes per cell of a direction matrix
+_DIRECTION_BYTES = np.dtype(np.uint8).itemsize
+
+# Hirschberg sub-problems at or below this many cells are solved with a direction matrix
+HIRSCHBERG_BASE_CELLS = 1 << 16
+
+# Initial half-width of the band used by banded_needleman_wunsch
+BAND_WIDTH = int(os.getenv("ALIGNMENT_BAND_WIDTH", "8"))
+
+# Backend used by align() when none is given: a name from ALIGNMENT_BACKENDS, or
+# "auto" for the compiled kernel when numba is importable and NumPy otherwise
+ALIGNMENT_BACKEND = os.getenv("ALIGNMENT_BACKEND", "auto")
+
+# Per-request ceiling on alignment working memory in bytes, enforced by plan_alignment;
+# by default the direction matrix of a LINEAR_MEMORY_CELLS problem
+ALIGNMENT_MEMORY_LIMIT = int(os.getenv("ALIGNMENT_MEMORY_LIMIT", str(LINEAR_MEMORY_CELLS * _DIRECTION_BYTES)))
+
+# plan_alignment only picks banded mode for sequences at least this long whose
+# lengths differ by at most BAND_WIDTH (below it the full DP is as fast)
+BANDED_MIN_LENGTH = 500
+
+# Score used for cells outside the band (far below any reachable score, safe from int32 overflow)
+_NEG_INF = -(1 << 30)
+
+
+def _alignment_result(aligned1, aligned2, score):
+    """
+    Build the result dictionary shared by every alignment engine.
+    """
+    matches = sum(1 for a, b in zip(aligned1, aligned2) if a == b)
+    alignment_length = len(aligned1)
+    match_percentage = (matches / alignment_length) * 100
+    mutations = sum(1 for a, b in zip(aligned1, aligned2) if a != b and a != '-' and b != '-')
+    gaps = aligned1.count('-') + aligned2.count('-')
+
+    return {
+        'score': score,
+        'aligned_seq1': aligned1,
+        'aligned_seq2': aligned2,
+        'match_percentage': match_percentage,
+        'mutations': mutations,
+        'gaps': gaps,
+        'alignment_length': alignment_length
+    }
+
+
+def ungapped_alignment(seq1, seq2, match_score=1, mismatch_score=-1):
+    """
+    Score two equal-length sequences column by column, without gaps or dynamic
+    programming (e.g. a region already known to match the reference verbatim
+    up to substitutions). Returns the usual result dictionary.
+    """
+    if len(seq1) != len(seq2):
+        raise ValueError(f"Ungapped alignment needs equal lengths, got {len(seq1)} and {len(seq2)}")
+    matches = int(np.count_nonzero(_encode(seq1) == _encode(seq2)))
+    return _alignment_result(seq1, seq2, matches * match_score + (len(seq1) - matches) * mismatch_score)
+
+
+def _encode(seq):
+    """
+    Convert a sequence string into a NumPy array of character codes.
+    """
+    if seq.isascii():
+        return np.frombuffer(seq.encode('ascii'), dtype=np.uint8)
+    return np.frombuffer(seq.encode('utf-32-le'), dtype=np.uint32)
+
+
 def needleman_wunsch(seq1, seq2, match_score=1, mismatch_score=-1, gap_penalty=-2):
     """
     Implement Needleman-Wunsch algorithm for global sequence alignment.
@@ -6,10 +93,10 @@ def needleman_wunsch(seq1, seq2, match_score=1, mismatch_score=-1, gap_penalty=-
     # Initialize score matrix
     n, m = len(seq1), len(seq2)
     score_matrix = [[0 for _ in range(m + 1)] for _ in range(n + 1)]
-    
+
     # Initialize traceback matrix
     traceback = [['' for _ in range(m + 1)] for _ in range(n + 1)]
-    
+
     # Initialize first row and column
     for i in range(n + 1):
         score_matrix[i][0] = gap_penalty * i
@@ -17,7 +104,7 @@ def needleman_wunsch(seq1, seq2, match_score=1, mismatch_score=-1, gap_penalty=-
     for j in range(m + 1):
         score_matrix[0][j] = gap_penalty * j
         traceback[0][j] = 'left'
-    
+
     # Fill the matrices
     for i in range(1, n + 1):
         for j in range(1, m + 1):
@@ -25,21 +112,21 @@ def needleman_wunsch(seq1, seq2, match_score=1, mismatch_score=-1, gap_penalty=-
             match = score_matrix[i-1][j-1] + (match_score if seq1[i-1] == seq2[j-1] else mismatch_score)
             delete = score_matrix[i-1][j] + gap_penalty
             insert = score_matrix[i][j-1] + gap_penalty
-            
+
             # Find the maximum score and its corresponding move
             score_matrix[i][j] = max(match, delete, insert)
-            
+
             if score_matrix[i][j] == match:
                 traceback[i][j] = 'diag'
             elif score_matrix[i][j] == delete:
                 traceback[i][j] = 'up'
             else:
                 traceback[i][j] = 'left'
-    
+
     # Traceback to find aligned sequences
     aligned1, aligned2 = [], []
     i, j = n, m
-    
+
     while i > 0 or j > 0:
         if traceback[i][j] == 'diag':
             aligned1.append(seq1[i-1])
@@ -54,24 +141,1263 @@ def needleman_wunsch(seq1, seq2, match_score=1, mismatch_score=-1, gap_penalty=-
             aligned1.append('-')
             aligned2.append(seq2[j-1])
             j -= 1
-    
+
     # Reverse the sequences
     aligned1 = ''.join(reversed(aligned1))
     aligned2 = ''.join(reversed(aligned2))
-    
-    # Calculate alignment statistics
-    matches = sum(1 for a, b in zip(aligned1, aligned2) if a == b)
-    alignment_length = len(aligned1)
-    match_percentage = (matches / alignment_length) * 100
-    mutations = sum(1 for a, b in zip(aligned1, aligned2) if a != b and a != '-' and b != '-')
-    gaps = aligned1.count('-') + aligned2.count('-')
-    
+
+    return _alignment_result(aligned1, aligned2, score_matrix[n][m])
+
+
+def _fill_rows(a, b, match_score, mismatch_score, gap_penalty):
+    """
+    Fill the DP one row of seq1 at a time, vectorized along seq2.
+    Returns the final score and the (n+1) x (m+1) uint8 direction matrix.
+    """
+    n, m = len(a), len(b)
+    trace = np.empty((n + 1, m + 1), dtype=np.uint8)
+    trace[:, 0] = UP
+    trace[0, :] = LEFT
+
+    gap_steps = np.arange(m + 1, dtype=np.int32) * gap_penalty
+    profiles = {}
+    row = gap_steps.copy()
+    for i in range(1, n + 1):
+        code = a[i - 1]
+        sub = profiles.get(code)
+        if sub is None:
+            sub = np.where(b == code, match_score, mismatch_score).astype(np.int32)
+            profiles[code] = sub
+        diag = row[:-1] + sub
+        up = row[1:] + gap_penalty
+
+        # Horizontal gaps chain within the row: H[j] = max_k (D[k] + (j - k) * gap)
+        best = np.empty(m + 1, dtype=np.int32)
+        best[0] = i * gap_penalty
+        np.maximum(diag, up, out=best[1:])
+        best -= gap_steps
+        np.maximum.accumulate(best, out=best)
+        best += gap_steps
+
+        directions = trace[i, 1:]
+        directions[:] = LEFT
+        directions[best[1:] == up] = UP
+        directions[best[1:] == diag] = DIAG
+        row = best
+    return int(row[m]), trace
+
+
+def _fill_columns(a, b, match_score, mismatch_score, gap_penalty):
+    """
+    Fill the DP one column of seq2 at a time, vectorized along seq1.
+    Used when seq1 is the longer sequence so the Python loop stays short.
+    """
+    n, m = len(a), len(b)
+    trace = np.empty((n + 1, m + 1), dtype=np.uint8, order='F')
+    trace[:, 0] = UP
+    trace[0, :] = LEFT
+
+    gap_steps = np.arange(n + 1, dtype=np.int32) * gap_penalty
+    profiles = {}
+    column = gap_steps.copy()
+    for j in range(1, m + 1):
+        code = b[j - 1]
+        sub = profiles.get(code)
+        if sub is None:
+            sub = np.where(a == code, match_score, mismatch_score).astype(np.int32)
+            profiles[code] = sub
+        diag = column[:-1] + sub
+        left = column[1:] + gap_penalty
+
+        # Vertical gaps chain within the column: H[i] = max_k (D[k] + (i - k) * gap)
+        best = np.empty(n + 1, dtype=np.int32)
+        best[0] = j * gap_penalty
+        np.maximum(diag, left, out=best[1:])
+        best -= gap_steps
+        np.maximum.accumulate(best, out=best)
+        best += gap_steps
+
+        up = best[:-1] + gap_penalty
+        directions = trace[1:, j]
+        directions[:] = LEFT
+        directions[best[1:] == up] = UP
+        directions[best[1:] == diag] = DIAG
+        column = best
+    return int(column[n]), trace
+
+
+def _traceback(seq1, seq2, trace, i, j):
+    """
+    Walk a direction matrix back from (i, j) to the origin and return the aligned strings.
+    """
+    aligned1, aligned2 = [], []
+    while i > 0 or j > 0:
+        move = trace[i, j]
+        if move == DIAG:
+            aligned1.append(seq1[i-1])
+            aligned2.append(seq2[j-1])
+            i -= 1
+            j -= 1
+        elif move == UP:
+            aligned1.append(seq1[i-1])
+            aligned2.append('-')
+            i -= 1
+        else:
+            aligned1.append('-')
+            aligned2.append(seq2[j-1])
+            j -= 1
+    return ''.join(reversed(aligned1)), ''.join(reversed(aligned2))
+
+
+def needleman_wunsch_numpy(seq1, seq2, match_score=1, mismatch_score=-1, gap_penalty=-2,
+                           linear_memory_cells=None):
+    """
+    NumPy implementation of needleman_wunsch.
+
+    Scores are kept as two rolling int32 vectors and the traceback as a uint8
+    direction matrix, so memory is one byte per cell instead of a Python string.
+    The Python loop runs over the shorter sequence and every step is vectorized
+    along the longer one. Tie-breaking (diag, then up, then left) matches
+    needleman_wunsch exactly, so both return identical dictionaries.
+
+    Problems larger than `linear_memory_cells` (default LINEAR_MEMORY_CELLS)
+    are handed to hirschberg, which returns the same result in O(n + m) memory.
+    """
+    if linear_memory_cells is None:
+        linear_memory_cells = LINEAR_MEMORY_CELLS
+    if (len(seq1) + 1) * (len(seq2) + 1) > linear_memory_cells:
+        return hirschberg(seq1, seq2, match_score, mismatch_score, gap_penalty)
+
+    a, b = _encode(seq1), _encode(seq2)
+    if len(seq1) >= len(seq2):
+        score, trace = _fill_columns(a, b, match_score, mismatch_score, gap_penalty)
+    else:
+        score, trace = _fill_rows(a, b, match_score, mismatch_score, gap_penalty)
+
+    aligned1, aligned2 = _traceback(seq1, seq2, trace, len(seq1), len(seq2))
+    return _alignment_result(aligned1, aligned2, score)
+
+
+def _row_step(prev, left_value, sub, gap_penalty, gap_steps):
+    """
+    Compute one DP row from the previous row and the row's boundary cell.
+    Returns the new row plus the diagonal and vertical candidates for columns 1..w.
+    """
+    diag = prev[:-1] + sub
+    vert = prev[1:] + gap_penalty
+    row = np.empty(len(prev), dtype=np.int32)
+    row[0] = left_value
+    np.maximum(diag, vert, out=row[1:])
+    row -= gap_steps
+    np.maximum.accumulate(row, out=row)
+    row += gap_steps
+    return row, diag, vert
+
+
+def _row_directions(row, diag, vert, gap_penalty, prefer_up):
+    """
+    Direction codes for columns 1..w of a row. Diagonal always wins ties;
+    `prefer_up` decides whether the vertical or the horizontal gap comes next.
+    """
+    body = row[1:]
+    if prefer_up:
+        directions = np.full(len(body), LEFT, dtype=np.uint8)
+        directions[body == vert] = UP
+    else:
+        directions = np.full(len(body), UP, dtype=np.uint8)
+        directions[body == row[:-1] + gap_penalty] = LEFT
+    directions[body == diag] = DIAG
+    return directions
+
+
+def _hirschberg_block(x, profiles, rect, top, left, gap_penalty, gap_steps, prefer_up, moves):
+    """
+    Solve a small Hirschberg sub-problem with a direction matrix and append its
+    moves (from the bottom-right corner back to the top-left) to `moves`.
+    """
+    r0, r1, c0, c1 = rect
+    h, w = r1 - r0, c1 - c0
+    trace = np.empty((h + 1, w + 1), dtype=np.uint8)
+    trace[:, 0] = UP
+    trace[0, :] = LEFT
+    steps = gap_steps[:w + 1]
+    row = top
+    for i in range(1, h + 1):
+        row, diag, vert = _row_step(row, left[i], profiles[x[r0 + i - 1]][c0:c1], gap_penalty, steps)
+        trace[i, 1:] = _row_directions(row, diag, vert, gap_penalty, prefer_up)
+
+    i, j = h, w
+    while i > 0 or j > 0:
+        move = trace[i, j]
+        moves.append(move)
+        if move == DIAG:
+            i -= 1
+            j -= 1
+        elif move == UP:
+            i -= 1
+        else:
+            j -= 1
+    return int(row[w])
+
+
+def _hirschberg_moves(x, y, match_score, mismatch_score, gap_penalty, prefer_up):
+    """
+    Linear-memory traceback of the global alignment of x (rows) against y (columns).
+
+    Each sub-problem is a rectangle of the full DP matrix together with its top
+    row and left column of scores. It is split at its middle row; instead of the
+    usual forward/backward score sum, the forward pass carries, for every cell,
+    the middle-row column its traceback path would reach first. That yields the
+    exact path a full direction matrix would give, not just an equally good one.
+    Returns the score and the moves from (len(x), len(y)) back to the origin.
+    """
+    n, m = len(x), len(y)
+    profiles = {code: np.where(y == code, match_score, mismatch_score).astype(np.int32)
+                for code in np.unique(x)}
+    gap_steps = np.arange(m + 1, dtype=np.int32) * gap_penalty
+    positions = np.arange(1, m + 1)
+    moves = bytearray()
+    score = None
+
+    # Pending rectangles hold copies of their boundaries; their rows and
+    # columns never overlap, so the stack stays O(n + m) in size.
+    stack = [((0, n, 0, m), gap_steps.copy(), np.arange(n + 1, dtype=np.int32) * gap_penalty)]
+    while stack:
+        rect, top, left = stack.pop()
+        r0, r1, c0, c1 = rect
+        h, w = r1 - r0, c1 - c0
+        if h <= 1 or (h + 1) * (w + 1) <= HIRSCHBERG_BASE_CELLS:
+            block_score = _hirschberg_block(x, profiles, rect, top, left, gap_penalty,
+                                            gap_steps, prefer_up, moves)
+            if score is None:
+                score = block_score
+            continue
+
+        mid = r0 + h // 2
+        steps = gap_steps[:w + 1]
+        row = top
+        for i in range(r0 + 1, mid + 1):
+            row, _, _ = _row_step(row, left[i - r0], profiles[x[i - 1]][c0:c1], gap_penalty, steps)
+        mid_row = row
+
+        # Propagate "first middle-row column reached" labels through the lower half
+        labels = np.arange(w + 1)
+        for i in range(mid + 1, r1 + 1):
+            row, diag, vert = _row_step(row, left[i - r0], profiles[x[i - 1]][c0:c1], gap_penalty, steps)
+            directions = _row_directions(row, diag, vert, gap_penalty, prefer_up)
+            inherited = np.empty(w + 1, dtype=labels.dtype)
+            inherited[0] = labels[0]
+            inherited[1:] = np.where(directions == DIAG, labels[:-1], labels[1:])
+            source = np.zeros(w + 1, dtype=np.intp)
+            source[1:] = np.where(directions != LEFT, positions[:w], 0)
+            np.maximum.accumulate(source, out=source)
+            labels = inherited[source]
+        if score is None:
+            score = int(row[w])
+        split = int(labels[w])
+
+        # Left boundary of the lower rectangle: scores of column c0 + split below the middle row
+        lower_left = np.empty(r1 - mid + 1, dtype=np.int32)
+        lower_left[0] = mid_row[split]
+        row = mid_row[:split + 1]
+        for i in range(mid + 1, r1 + 1):
+            row, _, _ = _row_step(row, left[i - r0], profiles[x[i - 1]][c0:c0 + split],
+                                  gap_penalty, gap_steps[:split + 1])
+            lower_left[i - mid] = row[split]
+
+        # The lower rectangle holds the end of the path, so it is solved first
+        stack.append(((r0, mid, c0, c0 + split), top[:split + 1].copy(), left[:mid - r0 + 1].copy()))
+        stack.append(((mid, r1, c0 + split, c1), mid_row[split:].copy(), lower_left))
+    return score, moves
+
+
+def hirschberg(seq1, seq2, match_score=1, mismatch_score=-1, gap_penalty=-2):
+    """
+    Linear-memory (Hirschberg) global alignment.
+
+    Returns exactly the same dictionary as needleman_wunsch, including the
+    choice between equally scoring alignments, while keeping memory at
+    O(n + m) instead of two (n+1) x (m+1) matrices. Costs roughly two to
+    three times the cell updates of needleman_wunsch_numpy.
+    """
+    a, b = _encode(seq1), _encode(seq2)
+    # Split along the shorter sequence and vectorize along the longer one
+    if len(seq1) <= len(seq2):
+        score, moves = _hirschberg_moves(a, b, match_score, mismatch_score, gap_penalty, prefer_up=True)
+        first_only, second_only = UP, LEFT
+    else:
+        score, moves = _hirschberg_moves(b, a, match_score, mismatch_score, gap_penalty, prefer_up=False)
+        first_only, second_only = LEFT, UP
+
+    aligned1, aligned2 = [], []
+    i = j = 0
+    for move in reversed(moves):
+        if move == DIAG:
+            aligned1.append(seq1[i])
+            aligned2.append(seq2[j])
+            i += 1
+            j += 1
+        elif move == first_only:
+            aligned1.append(seq1[i])
+            aligned2.append('-')
+            i += 1
+        else:
+            aligned1.append('-')
+            aligned2.append(seq2[j])
+            j += 1
+    return _alignment_result(''.join(aligned1), ''.join(aligned2), score)
+
+
+def _alignment_score(aligned1, aligned2, match_score, mismatch_score, gap_penalty):
+    """
+    Score an existing alignment column by column.
+    """
+    x, y = _encode(aligned1), _encode(aligned2)
+    gaps = (x == ord('-')) | (y == ord('-'))
+    same = (x == y) & ~gaps
+    matched = int(np.count_nonzero(same))
+    gapped = int(np.count_nonzero(gaps))
+    return matched * match_score + (len(x) - matched - gapped) * mismatch_score + gapped * gap_penalty
+
+
+def _band_rows(n, m, offset, k):
+    """
+    Query row of every band cell: an (m+1) x (2k+1) matrix with
+    rows[j, t] = j + offset - k + t and a mask of the rows that exist.
+    """
+    rows = np.arange(m + 1)[:, None] + (offset - k + np.arange(2 * k + 1))
+    return rows, (rows >= 0) & (rows <= n)
+
+
+def _banded_fill(a, b, offset, k, match_score, mismatch_score, gap_penalty):
+    """
+    Fill the DP only for cells with |(i - j) - offset| <= k, one column of seq2 at a time.
+
+    Column j is stored as a vector over t = i - j - offset + k in [0, 2k].
+    Returns the (m+1) x (2k+1) score and direction matrices; cells whose row
+    does not exist hold meaningless values.
+    """
+    n, m = len(a), len(b)
+    width = 2 * k + 1
+    rows, valid = _band_rows(n, m, offset, k)
+    codes = a[np.clip(rows[1:] - 1, 0, n - 1)]
+    sub = np.empty((m + 1, width), dtype=np.int32)
+    sub[1:] = np.where(codes == b[:, None], match_score, mismatch_score)
+    # Row 0 is the boundary H[0][j] = j * gap wherever it falls inside the band
+    is_top = rows == 0
+    top = np.full((m + 1, width), _NEG_INF, dtype=np.int32)
+    top[is_top] = (np.nonzero(is_top)[0] * gap_penalty).astype(np.int32)
+    # Column 0 is the boundary H[i][0] = i * gap
+    scores = np.empty((m + 1, width), dtype=np.int32)
+    scores[0] = np.where(valid[0], rows[0] * gap_penalty, _NEG_INF)
+
+    band_steps = np.arange(width, dtype=np.int32) * gap_penalty
+    has_top = is_top.any(axis=1)
+    left = np.full(width, _NEG_INF, dtype=np.int32)
+    for j in range(1, m + 1):
+        column = scores[j - 1]
+        best = scores[j]
+        np.add(column, sub[j], out=best)
+        np.add(column[1:], gap_penalty, out=left[:-1])
+        np.maximum(best, left, out=best)
+        if has_top[j]:
+            np.maximum(best, top[j], out=best)
+
+        # Vertical gaps chain within the band column, as in _fill_columns
+        best -= band_steps
+        np.maximum.accumulate(best, out=best)
+        best += band_steps
+
+    # Directions only depend on neighbouring scores, so they are derived in one pass
+    trace = np.full((m + 1, width), LEFT, dtype=np.uint8)
+    trace[0] = UP
+    trace[0, offset - k + np.arange(width) == 0] = LEFT
+    body = scores[1:]
+    up = np.full(body.shape, _NEG_INF, dtype=np.int32)
+    up[:, 1:] = body[:, :-1] + gap_penalty
+    trace[1:][body == up] = UP
+    trace[1:][body == scores[:-1] + sub[1:]] = DIAG
+    return scores, trace
+
+
+def _banded_traceback(seq1, seq2, trace, offset, k):
+    """
+    Trace a banded direction matrix back from (n, m), joining the band through
+    a gap chain when (n, m) lies outside it. Returns the aligned strings and
+    whether the path reached a boundary without entering the band at all.
+    """
+    n, m = len(seq1), len(seq2)
+    tail1, tail2 = '', ''
+    i, j = n, m
+    if n > m + offset + k:
+        i = m + offset + k
+        tail1, tail2 = seq1[i:], '-' * (n - i)
+    elif n < m + offset - k:
+        j = n - offset + k
+        tail1, tail2 = '-' * (m - j), seq2[j:]
+    missed_band = (i == 0 or j == 0) and n > 0 and m > 0
+
+    aligned1, aligned2 = [], []
+    while i > 0 and j > 0:
+        move = trace[j, i - j - offset + k]
+        if move == DIAG:
+            aligned1.append(seq1[i-1])
+            aligned2.append(seq2[j-1])
+            i -= 1
+            j -= 1
+        elif move == UP:
+            aligned1.append(seq1[i-1])
+            aligned2.append('-')
+            i -= 1
+        else:
+            aligned1.append('-')
+            aligned2.append(seq2[j-1])
+            j -= 1
+
+    head1 = seq1[:i] if i else '-' * j
+    head2 = '-' * i if i else seq2[:j]
+    aligned1 = head1 + ''.join(reversed(aligned1)) + tail1
+    aligned2 = head2 + ''.join(reversed(aligned2)) + tail2
+    return aligned1, aligned2, missed_band
+
+
+def _band_exit_bound(scores, n, m, offset, k, match_score, mismatch_score, gap_penalty):
+    """
+    Upper bound on the score of any alignment that leaves the band.
+
+    Such a path stays in the band (whose `scores` are exact for in-band paths,
+    leading gap chains included) up to the cell it leaves from, steps out over
+    the top or bottom edge, and then gains at most min(r, s) * max(best
+    substitution, two gaps) + |r - s| * gap over its r remaining rows and s
+    remaining columns. Paths that turn off the leading gap chain before it
+    reaches the band are bounded the same way.
+    """
+    best_step = max(match_score, mismatch_score)
+    diagonal = max(best_step, 2 * gap_penalty)
+
+    def remaining(i, j):
+        r, s = n - i, m - j
+        return np.minimum(r, s) * diagonal + np.abs(r - s) * gap_penalty
+
+    j = np.arange(m + 1, dtype=np.int64)
+    exits = []
+    # Top edge: a horizontal step from (i, j) to (i, j + 1)
+    i = j + offset - k
+    leaves = (i >= 0) & (i <= n) & (j < m)
+    exits.append(scores[leaves, 0] + gap_penalty + remaining(i[leaves], j[leaves] + 1))
+    # Bottom edge: a vertical step from (i, j) to (i + 1, j)
+    i = j + offset + k
+    leaves = (i >= 0) & (i < n)
+    exits.append(scores[leaves, 2 * k] + gap_penalty + remaining(i[leaves] + 1, j[leaves]))
+    # Leading gap chain down column 0 (or along row 0) before the band starts
+    if m and offset > k:
+        i = np.arange(min(offset - k, n + 1), dtype=np.int64)
+        exits.append(i * gap_penalty + gap_penalty + remaining(i, 1))
+        i = i[i < n]
+        exits.append(i * gap_penalty + best_step + remaining(i + 1, 1))
+    if n and offset < -k:
+        j = np.arange(min(-offset - k, m + 1), dtype=np.int64)
+        exits.append(j * gap_penalty + gap_penalty + remaining(1, j))
+        j = j[j < m]
+        exits.append(j * gap_penalty + best_step + remaining(1, j + 1))
+    return max((int(bounds.max()) for bounds in exits if len(bounds)), default=_NEG_INF)
+
+
+def banded_needleman_wunsch(seq1, seq2, match_score=1, mismatch_score=-1, gap_penalty=-2,
+                            offset=0, bandwidth=None):
+    """
+    Banded version of needleman_wunsch for a query that contains the reference
+    near a known position.
+
+    `offset` is the index in seq1 where seq2 is expected to start (for a window
+    extracted around an anchor hit this is the anchor index inside the window).
+    Only cells within `bandwidth` (default BAND_WIDTH) of that diagonal are
+    filled; the leading and trailing end gaps are closed as exact gap chains,
+    so the cost is O(len(seq2) * bandwidth) whatever the window length.
+
+    The in-band alignment is only returned when its score reaches an upper
+    bound on every path that leaves the band (_band_exit_bound), so it is
+    always optimal. Otherwise the band is doubled and the alignment repeated,
+    falling back to needleman_wunsch_numpy once it would cover the whole
+    matrix. Windows with long random flanks are a poor fit: there the global
+    optimum lets the reference ends drift into the flanks, away from the
+    anchor diagonal, and the alignment usually ends in that fallback.
+    """
+    n, m = len(seq1), len(seq2)
+    k = max(BAND_WIDTH if bandwidth is None else bandwidth, 1)
+    a, b = _encode(seq1), _encode(seq2)
+    while n and k < max(m + offset, n - offset):
+        # The band must reach the last row or the last column for the end chain to close
+        if n - offset + k >= 0 and m + offset + k >= 0:
+            scores, trace = _banded_fill(a, b, offset, k, match_score, mismatch_score, gap_penalty)
+            aligned1, aligned2, missed_band = _banded_traceback(seq1, seq2, trace, offset, k)
+            if not missed_band:
+                score = _alignment_score(aligned1, aligned2, match_score, mismatch_score, gap_penalty)
+                if score >= _band_exit_bound(scores.astype(np.int64), n, m, offset, k,
+                                             match_score, mismatch_score, gap_penalty):
+                    return _alignment_result(aligned1, aligned2, score)
+        k *= 2
+    return needleman_wunsch_numpy(seq1, seq2, match_score, mismatch_score, gap_penalty)
+
+
+def _encode_batch(sequences):
+    """
+    Stack sequences into a zero-padded 2-D code array; returns (codes, lengths).
+    """
+    lengths = np.array([len(seq) for seq in sequences], dtype=np.intp)
+    codes = np.zeros((len(sequences), int(lengths.max(initial=0))), dtype=np.uint32)
+    for row, seq in enumerate(sequences):
+        codes[row, :len(seq)] = _encode(seq)
+    return codes, lengths
+
+
+def _estimated_match_percentage(scores, n, m, match_score, mismatch_score, gap_penalty):
+    """
+    Estimate match_percentage from a global score, assuming the alignment uses
+    only the |n - m| gaps its length difference forces.
+    """
+    n = np.asarray(n)
+    aligned = np.minimum(n, m)
+    length = np.maximum(np.maximum(n, m), 1)
+    if match_score == mismatch_score:
+        return np.zeros(np.shape(scores))
+    matches = (scores - gap_penalty * np.abs(n - m) - mismatch_score * aligned) / (match_score - mismatch_score)
+    return np.clip(matches / length * 100, 0, 100)
+
+
+def _score_columns(codes, lengths, b, match_score, mismatch_score, gap_penalty, trace=None):
+    """
+    Score-only DP of a batch of padded queries (rows) against b, keeping two
+    rolling (batch x rows) columns. Returns each query's H[len(query)][len(b)].
+
+    If `trace` (a (len(b) + 1) x batch x (rows + 1) uint8 array) is given, the
+    direction codes of every cell are recorded in it as well.
+    """
+    batch, n = codes.shape
+    steps = np.arange(n + 1, dtype=np.int32) * gap_penalty
+    column = np.repeat(steps[None, :], batch, axis=0)
+    best = np.empty_like(column)
+    if trace is not None:
+        trace[0] = UP
+        trace[1:, :, 0] = LEFT
+    profiles = {}
+    for j in range(1, len(b) + 1):
+        code = b[j - 1]
+        sub = profiles.get(code)
+        if sub is None:
+            sub = np.where(codes == code, match_score, mismatch_score).astype(np.int32)
+            profiles[code] = sub
+        np.add(column[:, :-1], sub, out=best[:, 1:])
+        if trace is not None:
+            diag = best[:, 1:].copy()
+        np.maximum(best[:, 1:], column[:, 1:] + gap_penalty, out=best[:, 1:])
+        best[:, 0] = j * gap_penalty
+        best -= steps
+        np.maximum.accumulate(best, axis=1, out=best)
+        best += steps
+        if trace is not None:
+            directions = trace[j, :, 1:]
+            directions[:] = LEFT
+            directions[best[:, 1:] == best[:, :-1] + gap_penalty] = UP
+            directions[best[:, 1:] == diag] = DIAG
+        column, best = best, column
+    return column[np.arange(batch), lengths]
+
+
+def alignment_scores(queries, reference, match_score=1, mismatch_score=-1, gap_penalty=-2):
+    """
+    Score-only needleman_wunsch of many queries against one reference at once.
+
+    No traceback is built; the DP runs over the reference with all queries
+    stacked along a batch axis. Returns two arrays: the exact global scores
+    and the estimated match percentages (see alignment_score).
+    """
+    if not queries:
+        return np.zeros(0, dtype=np.int64), np.zeros(0)
+    codes, lengths = _encode_batch(queries)
+    scores = _score_columns(codes, lengths, _encode(reference), match_score, mismatch_score,
+                            gap_penalty).astype(np.int64)
+    estimates = _estimated_match_percentage(scores, lengths, len(reference), match_score,
+                                            mismatch_score, gap_penalty)
+    return scores, estimates
+
+
+def alignment_score(seq1, seq2, match_score=1, mismatch_score=-1, gap_penalty=-2):
+    """
+    Score-only fast path for callers that need a similarity number, not aligned strings.
+
+    Returns the exact needleman_wunsch score and an estimated match percentage
+    (exact when the optimal alignment needs no gaps beyond the length
+    difference). Only two rolling score vectors are kept.
+    """
+    # The global score is symmetric, so loop over the shorter sequence
+    if len(seq1) < len(seq2):
+        seq1, seq2 = seq2, seq1
+    scores, estimates = alignment_scores([seq1], seq2, match_score, mismatch_score, gap_penalty)
     return {
-        'score': score_matrix[n][m],
-        'aligned_seq1': aligned1,
-        'aligned_seq2': aligned2,
-        'match_percentage': match_percentage,
-        'mutations': mutations,
-        'gaps': gaps,
-        'alignment_length': alignment_length
-    } 
\ No newline at end of file
+        'score': int(scores[0]),
+        'estimated_match_percentage': float(estimates[0])
+    }
+
+
+def _align_batch(queries, reference, b, match_score, mismatch_score, gap_penalty):
+    """
+    Full alignments of a batch of queries against one encoded reference, sharing
+    the DP loop over the reference and the substitution profiles.
+    """
+    codes, lengths = _encode_batch(queries)
+    trace = np.empty((len(b) + 1, len(queries), codes.shape[1] + 1), dtype=np.uint8)
+    scores = _score_columns(codes, lengths, b, match_score, mismatch_score, gap_penalty, trace)
+    results = []
+    for row, query in enumerate(queries):
+        # (rows x columns) view of this query's directions, as _traceback expects
+        aligned1, aligned2 = _traceback(query, reference, trace[:, row, :].T, len(query), len(b))
+        results.append(_alignment_result(aligned1, aligned2, int(scores[row])))
+    return results
+
+
+def align_many(reference, queries, match_score=1, mismatch_score=-1, gap_penalty=-2):
+    """
+    needleman_wunsch(query, reference) for many queries in one call.
+
+    Queries are sorted by length, padded and aligned in batches whose direction
+    tensors stay under LINEAR_MEMORY_CELLS cells; the reference is encoded once
+    and its substitution profiles are shared by the whole batch. A query too
+    large for a batch of its own goes through needleman_wunsch_numpy.
+
+    Returns one result dictionary per query, in input order, identical to
+    needleman_wunsch(query, reference, ...).
+    """
+    b = _encode(reference)
+    columns = len(reference) + 1
+    results = [None] * len(queries)
+    order = sorted(range(len(queries)), key=lambda index: len(queries[index]))
+    start = 0
+    while start < len(order):
+        # Ascending lengths: the last query added is the one that sets the padding
+        end = start
+        while end < len(order) and (len(queries[order[end]]) + 1) * columns * (end - start + 1) <= LINEAR_MEMORY_CELLS:
+            end += 1
+        if end == start:
+            index = order[start]
+            results[index] = needleman_wunsch_numpy(queries[index], reference, match_score,
+                                                    mismatch_score, gap_penalty)
+            start += 1
+            continue
+        batch = order[start:end]
+        for index, result in zip(batch, _align_batch([queries[index] for index in batch], reference, b,
+                                                     match_score, mismatch_score, gap_penalty)):
+            results[index] = result
+        start = end
+    return results
+
+
+def _query_free_columns(a, b, match_score, mismatch_score, gap_penalty, local, with_trace):
+    """
+    Column-wise DP of query a (rows) against reference b (columns) where
+    leading query bases are free (H[i][0] = 0). In local mode scores are also
+    floored at zero and leading reference bases are free.
+
+    Returns the last column, the best (score, row, column) seen anywhere (used
+    by local mode) and, if requested, the direction matrix.
+    """
+    n, m = len(a), len(b)
+    steps = np.arange(n + 1, dtype=np.int32) * gap_penalty
+    column = np.zeros(n + 1, dtype=np.int32)
+    best = np.empty(n + 1, dtype=np.int32)
+    trace = None
+    if with_trace:
+        trace = np.empty((n + 1, m + 1), dtype=np.uint8, order='F')
+        trace[:, 0] = STOP
+        trace[0, 1:] = STOP if local else LEFT
+    top = (0, 0, 0)
+    profiles = {}
+    for j in range(1, m + 1):
+        code = b[j - 1]
+        sub = profiles.get(code)
+        if sub is None:
+            sub = np.where(a == code, match_score, mismatch_score).astype(np.int32)
+            profiles[code] = sub
+        diag = column[:-1] + sub
+        left = column[1:] + gap_penalty
+
+        best[0] = 0 if local else j * gap_penalty
+        np.maximum(diag, left, out=best[1:])
+        if local:
+            np.maximum(best[1:], 0, out=best[1:])
+        best -= steps
+        np.maximum.accumulate(best, out=best)
+        best += steps
+
+        if local:
+            row = int(np.argmax(best))
+            if best[row] > top[0]:
+                top = (int(best[row]), row, j)
+        if with_trace:
+            up = best[:-1] + gap_penalty
+            directions = trace[1:, j]
+            directions[:] = LEFT
+            directions[best[1:] == up] = UP
+            directions[best[1:] == diag] = DIAG
+            if local:
+                directions[best[1:] == 0] = STOP
+        column, best = best, column
+    return column, top, trace
+
+
+def _query_free_alignment(query, reference, match_score, mismatch_score, gap_penalty, local):
+    """
+    Shared engine of semi_global and smith_waterman.
+
+    A score-only pass over the whole query finds where the best alignment
+    ends. Its query span is at most len(reference) + (perfect score - best
+    score) / |gap|, so the traceback only needs a direction matrix for that
+    window instead of one the size of the whole upload.
+    """
+    a, b = _encode(query), _encode(reference)
+    n, m = len(query), len(reference)
+    last_column, top, _ = _query_free_columns(a, b, match_score, mismatch_score, gap_penalty,
+                                              local, with_trace=False)
+    if local:
+        score, query_end, reference_end = top
+    else:
+        query_end = int(np.argmax(last_column))
+        score, reference_end = int(last_column[query_end]), m
+
+    slack = max(0, (max(match_score, 0) * reference_end - score) // max(-gap_penalty, 1))
+    window_start = max(0, query_end - reference_end - slack)
+    _, _, trace = _query_free_columns(a[window_start:query_end], b[:reference_end], match_score,
+                                      mismatch_score, gap_penalty, local, with_trace=True)
+
+    aligned1, aligned2 = [], []
+    i, j = query_end - window_start, reference_end
+    while trace[i, j] != STOP and (i > 0 or j > 0):
+        move = trace[i, j]
+        if move == DIAG:
+            aligned1.append(query[window_start + i - 1])
+            aligned2.append(reference[j-1])
+            i -= 1
+            j -= 1
+        elif move == UP:
+            aligned1.append(query[window_start + i - 1])
+            aligned2.append('-')
+            i -= 1
+        else:
+            aligned1.append('-')
+            aligned2.append(reference[j-1])
+            j -= 1
+
+    aligned1 = ''.join(reversed(aligned1))
+    aligned2 = ''.join(reversed(aligned2))
+    if not aligned1:
+        result = {'score': score, 'aligned_seq1': '', 'aligned_seq2': '', 'match_percentage': 0.0,
+                  'mutations': 0, 'gaps': 0, 'alignment_length': 0}
+    else:
+        result = _alignment_result(aligned1, aligned2, score)
+    result.update({
+        'query_start': window_start + i,
+        'query_end': query_end,
+        'reference_start': j,
+        'reference_end': reference_end
+    })
+    return result
+
+
+def semi_global(query, reference, match_score=1, mismatch_score=-1, gap_penalty=-2):
+    """
+    Align the whole reference inside an arbitrarily long query in one pass.
+
+    End gaps on the query are free, so the reference is placed wherever it
+    scores best, indels included. Returns the needleman_wunsch statistics for
+    the aligned region plus its coordinates: query_start/query_end (0-based,
+    end exclusive) and reference_start/reference_end (always the full reference).
+    """
+    return _query_free_alignment(query, reference, match_score, mismatch_score, gap_penalty, local=False)
+
+
+def smith_waterman(query, reference, match_score=1, mismatch_score=-1, gap_penalty=-2):
+    """
+    Local alignment: the best-scoring stretch of the reference anywhere in the query.
+    Returns the same dictionary and coordinates as semi_global.
+    """
+    return _query_free_alignment(query, reference, match_score, mismatch_score, gap_penalty, local=True)
+
+
+def _fill_kernel(a, b, match_score, mismatch_score, gap_penalty):
+    """
+    Scalar DP over two rolling rows with a uint8 direction matrix; compiled by
+    numba when it is available (the loop body is plain enough for nopython mode).
+    """
+    n, m = len(a), len(b)
+    trace = np.empty((n + 1, m + 1), dtype=np.uint8)
+    prev = np.empty(m + 1, dtype=np.int64)
+    row = np.empty(m + 1, dtype=np.int64)
+    for j in range(m + 1):
+        prev[j] = j * gap_penalty
+        trace[0, j] = LEFT
+    for i in range(1, n + 1):
+        row[0] = i * gap_penalty
+        trace[i, 0] = UP
+        for j in range(1, m + 1):
+            diag = prev[j - 1] + (match_score if a[i - 1] == b[j - 1] else mismatch_score)
+            up = prev[j] + gap_penalty
+            left = row[j - 1] + gap_penalty
+            if diag >= up and diag >= left:
+                row[j] = diag
+                trace[i, j] = DIAG
+            elif up >= left:
+                row[j] = up
+                trace[i, j] = UP
+            else:
+                row[j] = left
+                trace[i, j] = LEFT
+        prev, row = row, prev
+    return prev[m], trace
+
+
+if numba is not None:
+    _fill_kernel = numba.njit(cache=True)(_fill_kernel)
+
+
+def needleman_wunsch_compiled(seq1, seq2, match_score=1, mismatch_score=-1, gap_penalty=-2,
+                              linear_memory_cells=None):
+    """
+    needleman_wunsch with the DP fill in _fill_kernel (numba-compiled when
+    available). Same result dictionary; problems larger than
+    `linear_memory_cells` (default LINEAR_MEMORY_CELLS) go to hirschberg.
+    """
+    if linear_memory_cells is None:
+        linear_memory_cells = LINEAR_MEMORY_CELLS
+    if (len(seq1) + 1) * (len(seq2) + 1) > linear_memory_cells:
+        return hirschberg(seq1, seq2, match_score, mismatch_score, gap_penalty)
+    score, trace = _fill_kernel(_encode(seq1), _encode(seq2), match_score, mismatch_score, gap_penalty)
+    aligned1, aligned2 = _traceback(seq1, seq2, trace, len(seq1), len(seq2))
+    return _alignment_result(aligned1, aligned2, int(score))
+
+
+# Global alignment backends by name; each takes
+# (seq1, seq2, match_score, mismatch_score, gap_penalty) and returns the needleman_wunsch dictionary
+ALIGNMENT_BACKENDS = {
+    'python': needleman_wunsch,
+    'numpy': needleman_wunsch_numpy,
+    'hirschberg': hirschberg,
+}
+if numba is not None:
+    ALIGNMENT_BACKENDS['numba'] = needleman_wunsch_compiled
+
+
+def register_backend(name, func):
+    """
+    Add (or replace) a global alignment backend selectable by name.
+    """
+    ALIGNMENT_BACKENDS[name] = func
+
+
+def get_backend(name=None):
+    """
+    Resolve a backend name (default: ALIGNMENT_BACKEND) to its alignment function.
+    Raises ValueError for names that are not registered.
+    """
+    return ALIGNMENT_BACKENDS[_backend_name(name)]
+
+
+def _backend_name(name=None):
+    """
+    Resolve a backend name, applying the ALIGNMENT_BACKEND default and "auto".
+    """
+    name = name or ALIGNMENT_BACKEND
+    if name == 'auto':
+        name = 'numba' if 'numba' in ALIGNMENT_BACKENDS else 'numpy'
+    if name not in ALIGNMENT_BACKENDS:
+        raise ValueError(f"Unknown alignment backend '{name}'. Available: {', '.join(sorted(ALIGNMENT_BACKENDS))}")
+    return name
+
+
+def align(seq1, seq2, match_score=1, mismatch_score=-1, gap_penalty=-2, backend=None):
+    """
+    Global alignment through the backend registry. `backend` names an entry of
+    ALIGNMENT_BACKENDS; by default the ALIGNMENT_BACKEND environment setting is used.
+    """
+    return get_backend(backend)(seq1, seq2, match_score, mismatch_score, gap_penalty)
+
+
+def _adversarial_cases(rng):
+    """
+    Inputs that stress tie-breaking and boundaries: homopolymers, tandem
+    repeats, all-mismatch pairs, empty and single-base sides, extreme length
+    ratios, and non-ACGT / non-ASCII symbols.
+    """
+    return [
+        ('A', 'A'), ('A', 'T'), ('A', ''), ('', 'GATTACA'),
+        ('A' * 40, 'A' * 25), ('A' * 25, 'A' * 40),
+        ('AC' * 30, 'CA' * 30), ('ACG' * 20, 'ACG' * 19 + 'AC'),
+        ('A' * 30, 'T' * 30), ('AAAA' * 10, 'TTTT' * 3),
+        ('G', ''.join(rng.choice('ACGT') for _ in range(300))),
+        (''.join(rng.choice('ACGT') for _ in range(300)), 'C'),
+        ('ACGTNNNNACGT', 'ACGTACGT'), ('acgtRYKM', 'ACGTRYKM'), ('ACGTΔACGT', 'ACGTACGTΔ'),
+    ]
+
+
+def check_backends(cases=200, seed=0, backends=None):
+    """
+    Equivalence harness: compare every backend against needleman_wunsch on
+    adversarial inputs and `cases` random pairs under several scoring schemes.
+
+    Returns {backend name: list of (seq1, seq2, scoring) cases whose result
+    differed}; all lists are empty when the backends agree.
+    """
+    rng = random.Random(seed)
+    pairs = _adversarial_cases(rng)
+    for _ in range(cases):
+        alphabet = rng.choice(['AC', 'ACGT', 'ACGTN'])
+        seq1 = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 60)))
+        seq2 = ''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 60)))
+        pairs.append((seq1, seq2))
+    schemes = [(1, -1, -2), (1, -1, -1), (2, -1, -1), (1, 0, -1), (1, -3, -1)]
+
+    failures = {name: [] for name in (backends or ALIGNMENT_BACKENDS)}
+    for index, (seq1, seq2) in enumerate(pairs):
+        if not seq1 and not seq2:
+            continue
+        scoring = schemes[index % len(schemes)]
+        expected = needleman_wunsch(seq1, seq2, *scoring)
+        for name in failures:
+            if ALIGNMENT_BACKENDS[name](seq1, seq2, *scoring) != expected:
+                failures[name].append((seq1, seq2, scoring))
+    return failures
+
+
+# Cost model used by plan_alignment, measured on the benchmark_alignment.py
+# workloads: seconds per Python-loop step, per DP cell and per traceback step
+_COST_MODEL = {
+    'python': (0.0, 8e-7, 0.0),
+    'numpy': (1.2e-5, 1e-8, 6e-7),
+    'numba': (0.0, 8e-9, 6e-7),
+    'linear-memory': (4e-5, 5e-8, 6e-7),
+    'banded': (2.5e-5, 1e-8, 6e-7),
+    'score-only': (8e-6, 4.5e-9, 0.0),
+}
+
+# Bytes per DP cell of a full-matrix backend (the pure-Python engine keeps two
+# matrices of object pointers, the others one uint8 direction per cell)
+_FULL_CELL_BYTES = {'python': 16}
+
+
+def _estimate_cost(mode, n, m, full_backend=None):
+    """
+    Estimated (bytes, seconds) of one alignment of an n x m problem in `mode`.
+    """
+    cells = (n + 1) * (m + 1)
+    longer, shorter = max(n, m), min(n, m)
+    if mode == 'full':
+        steps, cost_cells = shorter, cells
+        model = _COST_MODEL.get(full_backend, _COST_MODEL['numpy'])
+        memory = cells * _FULL_CELL_BYTES.get(full_backend, _DIRECTION_BYTES) + 24 * (longer + 1)
+    elif mode == 'banded':
+        width = 2 * BAND_WIDTH + 1 + abs(n - m)
+        steps, cost_cells = longer, (n + 1) * width
+        model = _COST_MODEL['banded']
+        memory = 16 * cost_cells
+    elif mode == 'linear-memory':
+        steps, cost_cells = shorter, cells
+        model = _COST_MODEL['linear-memory']
+        memory = 32 * (n + m + 2) + HIRSCHBERG_BASE_CELLS
+    else:
+        steps, cost_cells = shorter, cells
+        model = _COST_MODEL['score-only']
+        memory = 20 * (longer + 1)
+    per_step, per_cell, per_traceback = model
+    seconds = steps * per_step + cost_cells * per_cell + (n + m) * per_traceback
+    return memory, seconds
+
+
+def plan_alignment(n, m, backend=None, memory_limit=None, offset=None, traceback=True):
+    """
+    Choose how to align an n x m problem.
+
+    Modes:
+        score-only: the caller needs no traceback (alignment_score); it can
+            re-plan with traceback=True if the aligned strings turn out to be needed
+        banded: the offset of seq2 in seq1 is known and both are about the same
+            length (within BAND_WIDTH) and at least BANDED_MIN_LENGTH long
+        full: a full-matrix backend from the registry, if its direction matrix
+            fits in `memory_limit` (default ALIGNMENT_MEMORY_LIMIT)
+        linear-memory: hirschberg otherwise, or when that backend was requested
+
+    Returns the plan as a dictionary (mode, backend, cells, memory limit and
+    estimated bytes/seconds). Raises MemoryError if even the chosen mode
+    exceeds the memory limit.
+    """
+    if memory_limit is None:
+        memory_limit = ALIGNMENT_MEMORY_LIMIT
+    backend = _backend_name(backend)
+    if not traceback:
+        mode = 'score-only'
+    elif offset is not None and abs(n - m) <= BAND_WIDTH and min(n, m) >= BANDED_MIN_LENGTH:
+        mode = 'banded'
+    elif backend != 'hirschberg' and _estimate_cost('full', n, m, backend)[0] <= memory_limit:
+        mode = 'full'
+    else:
+        mode = 'linear-memory'
+
+    memory, seconds = _estimate_cost(mode, n, m, backend)
+    if memory > memory_limit:
+        raise MemoryError(f"Aligning {n} x {m} needs about {memory} bytes in {mode} mode, "
+                          f"over the {memory_limit} byte limit")
+    return {
+        'mode': mode,
+        'backend': backend if mode == 'full' else None,
+        'cells': (n + 1) * (m + 1),
+        'memory_limit': memory_limit,
+        'estimated_bytes': memory,
+        'estimated_seconds': seconds
+    }
+
+
+def planned_alignment(seq1, seq2, match_score=1, mismatch_score=-1, gap_penalty=-2, backend=None,
+                      memory_limit=None, offset=None, traceback=True):
+    """
+    Align through plan_alignment and run the chosen engine.
+
+    Returns that engine's result dictionary with the plan added under 'plan',
+    including the measured 'actual_seconds' next to the estimates.
+    """
+    plan = plan_alignment(len(seq1), len(seq2), backend, memory_limit, offset, traceback)
+    start = time.perf_counter()
+    if plan['mode'] == 'score-only':
+        result = alignment_score(seq1, seq2, match_score, mismatch_score, gap_penalty)
+    elif plan['mode'] == 'banded':
+        result = banded_needleman_wunsch(seq1, seq2, match_score, mismatch_score, gap_penalty, offset=offset)
+    elif plan['mode'] == 'linear-memory':
+        result = hirschberg(seq1, seq2, match_score, mismatch_score, gap_penalty)
+    elif plan['backend'] in ('numpy', 'numba'):
+        # The plan already checked the memory limit; keep the engine from re-deciding
+        result = ALIGNMENT_BACKENDS[plan['backend']](seq1, seq2, match_score, mismatch_score, gap_penalty,
+                                                     linear_memory_cells=plan['cells'])
+    else:
+        result = ALIGNMENT_BACKENDS[plan['backend']](seq1, seq2, match_score, mismatch_score, gap_penalty)
+    plan['actual_seconds'] = time.perf_counter() - start
+    result['plan'] = plan
+    return result
+
+
+class AlignmentCoordinates:
+    """
+    Coordinate index of one pairwise alignment, built once with prefix sums.
+
+    Maps in O(1) per position, for scalars or whole arrays at once, between
+    aligned columns, query-relative and reference-relative positions, absolute
+    positions in the uploaded sequence (query_offset + query position) and
+    genomic positions (genomic_start + reference position). Positions that
+    fall on a gap or outside the alignment map to -1.
+    """
+
+    def __init__(self, aligned_query, aligned_reference, query_offset=0, genomic_start=0):
+        query_bases = _encode(aligned_query) != ord('-')
+        reference_bases = _encode(aligned_reference) != ord('-')
+        # Bases of each sequence before every column (its position if the column is not a gap)
+        self._query_before = np.cumsum(query_bases) - query_bases
+        self._reference_before = np.cumsum(reference_bases) - reference_bases
+        self._query_bases = query_bases
+        self._reference_bases = reference_bases
+        # Column of every base
+        self._query_columns = np.flatnonzero(query_bases)
+        self._reference_columns = np.flatnonzero(reference_bases)
+        self.query_offset = query_offset
+        self.genomic_start = genomic_start
+        self.length = len(query_bases)
+
+    @staticmethod
+    def _lookup(table, positions, mask=None):
+        index = np.asarray(positions, dtype=np.int64)
+        inside = (index >= 0) & (index < len(table))
+        values = np.where(inside, table[np.clip(index, 0, max(len(table) - 1, 0))] if len(table) else -1, -1)
+        if mask is not None:
+            values = np.where(inside & mask[np.clip(index, 0, max(len(mask) - 1, 0))], values, -1)
+        return int(values) if values.ndim == 0 else values
+
+    def aligned_to_query(self, columns):
+        return self._lookup(self._query_before, columns, self._query_bases)
+
+    def aligned_to_reference(self, columns):
+        return self._lookup(self._reference_before, columns, self._reference_bases)
+
+    def query_to_aligned(self, positions):
+        return self._lookup(self._query_columns, positions)
+
+    def reference_to_aligned(self, positions):
+        return self._lookup(self._reference_columns, positions)
+
+    def aligned_to_absolute(self, columns):
+        query = np.asarray(self.aligned_to_query(columns))
+        absolute = np.where(query >= 0, query + self.query_offset, -1)
+        return int(absolute) if absolute.ndim == 0 else absolute
+
+    def aligned_to_genomic(self, columns):
+        reference = np.asarray(self.aligned_to_reference(columns))
+        genomic = np.where(reference >= 0, reference + self.genomic_start, -1)
+        return int(genomic) if genomic.ndim == 0 else genomic
+
+    def absolute_to_aligned(self, positions):
+        return self.query_to_aligned(np.asarray(positions) - self.query_offset)
+
+    def genomic_to_aligned(self, positions):
+        return self.reference_to_aligned(np.asarray(positions) - self.genomic_start)
+
+
+def _runs(mask):
+    """Start and end (exclusive) indices of the runs of True in a boolean array."""
+    padded = np.concatenate(([False], mask, [False]))
+    edges = np.flatnonzero(padded[1:] != padded[:-1])
+    return edges[0::2], edges[1::2]
+
+
+def call_variants(aligned_query, aligned_reference, query_offset=0, genomic_start=0, include_end_gaps=False):
+    """
+    Every difference between two aligned strings, found in one vectorized pass.
+
+    Substitutions are reported per column, insertions (bases only in the query)
+    and deletions (bases only in the reference) per run of gap columns. End gaps
+    (e.g. the flanks of an analysis window) are skipped unless include_end_gaps.
+
+    Returns a columnar dictionary of equal-length NumPy arrays, ordered by
+    alignment column:
+        type: 'X' substitution, 'I' insertion, 'D' deletion
+        aligned_position, length: first column and number of columns
+        query_position / reference_position: position of the first affected base
+            (for indels, of the next base of the sequence without the gap)
+        absolute_position / genomic_position: the same offset by query_offset /
+            genomic_start
+        reference_bases / query_bases: the differing bases ('' on the gap side)
+    """
+    coordinates = AlignmentCoordinates(aligned_query, aligned_reference, query_offset, genomic_start)
+    query_bases, reference_bases = coordinates._query_bases, coordinates._reference_bases
+    both = query_bases & reference_bases
+    if include_end_gaps or not both.any():
+        core = np.ones(len(both), dtype=bool)
+    else:
+        columns = np.flatnonzero(both)
+        core = np.zeros(len(both), dtype=bool)
+        core[columns[0]:columns[-1] + 1] = True
+
+    substitutions = np.flatnonzero(both & (_encode(aligned_query) != _encode(aligned_reference)))
+    insert_starts, insert_ends = _runs(query_bases & ~reference_bases & core)
+    delete_starts, delete_ends = _runs(reference_bases & ~query_bases & core)
+
+    starts = np.concatenate((substitutions, insert_starts, delete_starts))
+    lengths = np.concatenate((np.ones(len(substitutions), dtype=np.int64), insert_ends - insert_starts,
+                              delete_ends - delete_starts))
+    types = np.array(['X'] * len(substitutions) + ['I'] * len(insert_starts) + ['D'] * len(delete_starts),
+                     dtype='<U1')
+    order = np.argsort(starts, kind='stable')
+    starts, lengths, types = starts[order], lengths[order], types[order]
+
+    query_position = coordinates._query_before[starts]
+    reference_position = coordinates._reference_before[starts]
+    query_slices = [aligned_query[start:start + length] if kind != 'D' else ''
+                    for start, length, kind in zip(starts.tolist(), lengths.tolist(), types.tolist())]
+    reference_slices = [aligned_reference[start:start + length] if kind != 'I' else ''
+                        for start, length, kind in zip(starts.tolist(), lengths.tolist(), types.tolist())]
+    return {
+        'type': types,
+        'aligned_position': starts.astype(np.int64),
+        'length': lengths.astype(np.int64),
+        'query_position': query_position,
+        'reference_position': reference_position,
+        'absolute_position': query_position + query_offset,
+        'genomic_position': reference_position + genomic_start,
+        'reference_bases': np.array(reference_slices, dtype=str),
+        'query_bases': np.array(query_slices, dtype=str)
+    }
+
+
+def variants_to_lists(variants):
+    """
+    JSON-ready form of call_variants output (plain lists per column).
+    """
+    return {name: column.tolist() for name, column in variants.items()}
+
+
+_CIGAR_OP = re.compile(r'(\d+)([=XID])')
+
+
+def encode_cigar(aligned1, aligned2):
+    """
+    Run-length edit script of an alignment: '=' match, 'X' mismatch, 'I' base
+    only in seq1 (the query), 'D' base only in seq2 (the reference).
+
+    Returns (cigar, bases), where bases are the seq1 characters of the X and I
+    columns; together with seq2 that is enough to rebuild both aligned strings.
+    """
+    ops = []
+    bases = []
+    for a, b in zip(aligned1, aligned2):
+        if b == '-':
+            ops.append('I')
+            bases.append(a)
+        elif a == '-':
+            ops.append('D')
+        elif a == b:
+            ops.append('=')
+        else:
+            ops.append('X')
+            bases.append(a)
+    cigar = ''.join(f"{sum(1 for _ in run)}{op}" for op, run in groupby(ops))
+    return cigar, ''.join(bases)
+
+
+def decode_cigar(cigar, bases, reference, reference_start=0):
+    """
+    Rebuild (aligned1, aligned2) from encode_cigar output and the reference sequence.
+    """
+    aligned1, aligned2 = [], []
+    ref_pos, base_pos = reference_start, 0
+    for count, op in _CIGAR_OP.findall(cigar):
+        count = int(count)
+        if op == '=':
+            segment = reference[ref_pos:ref_pos + count]
+            aligned1.append(segment)
+            aligned2.append(segment)
+            ref_pos += count
+        elif op == 'X':
+            aligned1.append(bases[base_pos:base_pos + count])
+            aligned2.append(reference[ref_pos:ref_pos + count])
+            ref_pos += count
+            base_pos += count
+        elif op == 'I':
+            aligned1.append(bases[base_pos:base_pos + count])
+            aligned2.append('-' * count)
+            base_pos += count
+        else:
+            aligned1.append('-' * count)
+            aligned2.append(reference[ref_pos:ref_pos + count])
+            ref_pos += count
+    return ''.join(aligned1), ''.join(aligned2)
+
+
+def compact_alignment(result):
+    """
+    Replace the aligned strings of a result dictionary with its CIGAR edit
+    script ('cigar', 'query_bases') and the reference coordinates it covers
+    ('reference_start', 'reference_end'). All other fields are kept.
+    """
+    compact = {key: value for key, value in result.items() if key not in ('aligned_seq1', 'aligned_seq2')}
+    cigar, bases = encode_cigar(result['aligned_seq1'], result['aligned_seq2'])
+    reference_start = result.get('reference_start', 0)
+    compact.update({
+        'cigar': cigar,
+        'query_bases': bases,
+        'reference_start': reference_start,
+        'reference_end': reference_start + len(result['aligned_seq2']) - result['aligned_seq2'].count('-')
+    })
+    return compact
+
+
+def expand_alignment(compact, reference):
+    """
+    Inverse of compact_alignment: restore aligned_seq1/aligned_seq2 using the reference sequence.
+    """
+    result = {key: value for key, value in compact.items() if key not in ('cigar', 'query_bases')}
+    result['aligned_seq1'], result['aligned_seq2'] = decode_cigar(
+        compact['cigar'], compact['query_bases'], reference, compact['reference_start'])
+    return result
@@ -0,0 +1,119 @@
+import os
+import sys
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+# Upper bound on the estimated size of all cached alignments (0 disables the cache)
+ALIGNMENT_CACHE_BYTES = int(os.getenv("ALIGNMENT_CACHE_BYTES", str(64 << 20)))
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _result_size(result: Dict[str, Any]) -> int:
+    """
+    Approximate memory held by an alignment result dictionary (one level of nesting).
+    """
+    size = sys.getsizeof(result)
+    for value in result.values():
+        size += sys.getsizeof(value)
+        if isinstance(value, dict):
+            size += sum(sys.getsizeof(item) for item in value.values())
+    return size
+
+
+class AlignmentCache:
+    """
+    Byte-bounded LRU cache of alignment results.
+
+    Entries are keyed by a hash of (query, reference, scoring parameters, backend,
+    expected offset) and evicted least-recently-used first once their estimated
+    size exceeds max_bytes. Hit, miss and eviction counters are kept for monitoring.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        self.max_bytes = ALIGNMENT_CACHE_BYTES if max_bytes is None else max_bytes
+        self._entries = OrderedDict()  # key -> (result, size, reference digest)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(query: str, reference: str, match_score: int = 1, mismatch_score: int = -1, gap_penalty: int = -2,
+                 backend: Optional[str] = None, offset: Optional[int] = None) -> str:
+        """
+        Cache key of an alignment. The requested backend and the expected offset
+        are part of it, since they decide which engine (and so which of several
+        equally scored alignments) produces the result.
+        """
+        return _digest(f"{query}\x00{reference}\x00{match_score}:{mismatch_score}:{gap_penalty}\x00{backend}:{offset}")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Return a copy of the cached result for `key`, or None on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._copy(entry[0])
+
+    def put(self, key: str, reference: str, result: Dict[str, Any]) -> None:
+        """
+        Store a result computed against `reference`, evicting old entries as needed.
+        Results larger than the whole budget are not cached.
+        """
+        size = _result_size(result) + len(key)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (self._copy(result), size, _digest(reference))
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def invalidate(self, reference: Optional[str] = None) -> int:
+        """
+        Drop every cached alignment against `reference` (all entries if None),
+        e.g. after the SNP database changes. Returns the number of entries removed.
+        """
+        with self._lock:
+            if reference is None:
+                removed = len(self._entries)
+                self._entries.clear()
+                self._bytes = 0
+                return removed
+            target = _digest(reference)
+            stale = [key for key, (_, _, digest) in self._entries.items() if digest == target]
+            for key in stale:
+                self._bytes -= self._entries.pop(key)[1]
+            return len(stale)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+    @staticmethod
+    def _copy(result: Dict[str, Any]) -> Dict[str, Any]:
+        # Callers may annotate the result; keep the cached copy (and nested dicts) untouched
+        return {name: dict(value) if isinstance(value, dict) else value for name, value in result.items()}
@@ -0,0 +1,695 @@
+#!/usr/bin/env python3
+"""
+Benchmark the alignment engines against the pure-Python needleman_wunsch
+"""
+
+import sys
+import os
+import random
+import time
+import json
+import tracemalloc
+import logging
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from alignment import (
+    needleman_wunsch, planned_alignment, ungapped_alignment, needleman_wunsch_numpy, hirschberg, banded_needleman_wunsch, alignment_scores, alignment_score,
+    semi_global, smith_waterman, align_many, ALIGNMENT_BACKENDS, check_backends,
+    compact_alignment, expand_alignment, AlignmentCoordinates, call_variants
+)
+from region_search import (find_approximate, KmerIndex, ChunkSeedCache, ungapped_matches, reverse_complement,
+                           content_chunks, PARALLEL_SCAN_MIN_LENGTH, _CHUNK_WINDOW)
+import mutation_analysis
+from mutation_analysis import MutationAnalyzer
+from reference_genome import ReferenceGenome
+from fm_index import FMIndex
+from snp_catalog import build_catalog, SnpCatalog, PositionIndex
+from genotype_import import GenotypeIndex, import_genotypes
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# HBB reference used throughout the debug scripts
+REFERENCE = "ATGGTGCACCTGACTCCTGAGGAGAAGTCTGCCGTTACTGCCCTGTGGGGCAAGGTGAACGTGGATGAAGTTGGTGGTGAGGCCCTGGGCAG"
+
+# Above this many cells the pure-Python engine is only timed once
+SLOW_CELL_LIMIT = 200_000
+
+
+def random_sequence(length, rng):
+    return ''.join(rng.choice('ACGT') for _ in range(length))
+
+
+def mutate(sequence, rng, substitutions, indels):
+    """Apply random substitutions and single-base insertions/deletions."""
+    bases = list(sequence)
+    for _ in range(substitutions):
+        bases[rng.randrange(len(bases))] = rng.choice('ACGT')
+    for _ in range(indels):
+        position = rng.randrange(len(bases))
+        if rng.random() < 0.5:
+            del bases[position]
+        else:
+            bases.insert(position, rng.choice('ACGT'))
+    return ''.join(bases)
+
+
+def make_window(length, rng):
+    """Embed a lightly mutated copy of the reference in random flanking sequence."""
+    ref = list(REFERENCE)
+    for _ in range(3):
+        ref[rng.randrange(len(ref))] = rng.choice('ACGT')
+    del ref[rng.randrange(len(ref))]
+    core = ''.join(ref)
+    flank = max(0, length - len(core))
+    left = flank // 2
+    return random_sequence(left, rng) + core + random_sequence(flank - left, rng)
+
+
+def time_call(func, *args, repeat=3):
+    """Return the best wall-clock time over `repeat` calls and the last result."""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def benchmark_engines(lengths=(90, 290, 1000, 10000)):
+    """Print cells/second for the pure-Python and NumPy engines"""
+    rng = random.Random(42)
+    print("=== Needleman-Wunsch: pure Python vs NumPy ===")
+    print(f"{'query':>8} {'ref':>5} {'cells':>10} {'python c/s':>14} {'numpy c/s':>14} {'speedup':>8}  same")
+    for length in lengths:
+        query = make_window(length, rng)
+        cells = (len(query) + 1) * (len(REFERENCE) + 1)
+        repeat = 1 if cells > SLOW_CELL_LIMIT else 3
+        py_time, py_result = time_call(needleman_wunsch, query, REFERENCE, repeat=repeat)
+        np_time, np_result = time_call(needleman_wunsch_numpy, query, REFERENCE)
+        print(f"{len(query):>8} {len(REFERENCE):>5} {cells:>10} "
+              f"{cells / py_time:>14,.0f} {cells / np_time:>14,.0f} "
+              f"{py_time / np_time:>7.1f}x  {py_result == np_result}")
+
+
+def peak_memory(func, *args):
+    """Return the peak traced allocation (bytes) of a single call."""
+    tracemalloc.start()
+    try:
+        func(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark_linear_memory(shapes=((10000, 92), (3000, 2500), (100000, 92))):
+    """Compare time and peak memory of the full-matrix and Hirschberg engines"""
+    rng = random.Random(7)
+    print("\n=== Full direction matrix vs Hirschberg (linear memory) ===")
+    print(f"{'query':>8} {'ref':>6} {'full s':>8} {'full MB':>8} {'hirsch s':>9} {'hirsch MB':>10}  same")
+    for query_len, ref_len in shapes:
+        query = random_sequence(query_len, rng)
+        reference = random_sequence(ref_len, rng)
+        full_time, full_result = time_call(needleman_wunsch_numpy, query, reference, repeat=1)
+        linear_time, linear_result = time_call(hirschberg, query, reference, repeat=1)
+        full_mem = peak_memory(needleman_wunsch_numpy, query, reference) / 1e6
+        linear_mem = peak_memory(hirschberg, query, reference) / 1e6
+        print(f"{query_len:>8} {ref_len:>6} {full_time:>8.3f} {full_mem:>8.1f} "
+              f"{linear_time:>9.3f} {linear_mem:>10.1f}  {full_result == linear_result}")
+
+
+def benchmark_banded(ref_lengths=(92, 1000, 5000), flanks=(3, 100), samples=10):
+    """Compare the full and banded engines on query windows around a known anchor offset"""
+    rng = random.Random(11)
+    print("\n=== Full DP vs banded (anchor offset known) ===")
+    print(f"{'ref':>6} {'flank':>6} {'full ms':>9} {'banded ms':>10} {'speedup':>8}  identical  optimal")
+    for flank in flanks:
+        for ref_len in ref_lengths:
+            full_total = banded_total = 0.0
+            identical = optimal = 0
+            for _ in range(samples):
+                reference = REFERENCE if ref_len == len(REFERENCE) else random_sequence(ref_len, rng)
+                core = mutate(reference, rng, substitutions=max(1, ref_len // 30), indels=max(1, ref_len // 500))
+                left = rng.randint(0, flank)
+                query = random_sequence(left, rng) + core + random_sequence(rng.randint(0, flank), rng)
+                full_time, full_result = time_call(needleman_wunsch_numpy, query, reference, repeat=1)
+                banded_time, banded_result = time_call(
+                    lambda: banded_needleman_wunsch(query, reference, offset=left), repeat=1)
+                full_total += full_time
+                banded_total += banded_time
+                identical += full_result == banded_result
+                optimal += banded_result['score'] == alignment_score(query, reference)['score']
+            print(f"{ref_len:>6} {flank:>6} {full_total / samples * 1e3:>9.2f} {banded_total / samples * 1e3:>10.2f} "
+                  f"{full_total / banded_total:>7.1f}x  {identical:>5}/{samples} {optimal:>5}/{samples}")
+
+
+def benchmark_score_only(candidate_counts=(10, 100, 1000)):
+    """Rank candidate windows: full alignments in a loop vs one batched score-only call"""
+    rng = random.Random(5)
+    print("\n=== Candidate ranking: needleman_wunsch_numpy loop vs alignment_scores ===")
+    print(f"{'windows':>8} {'loop ms':>9} {'batch ms':>9} {'speedup':>8}  same scores")
+    for count in candidate_counts:
+        windows = [make_window(len(REFERENCE), rng) for _ in range(count)]
+        loop_time, loop_scores = time_call(
+            lambda: [needleman_wunsch_numpy(window, REFERENCE)['score'] for window in windows], repeat=1)
+        batch_time, (batch_scores, _) = time_call(lambda: alignment_scores(windows, REFERENCE))
+        print(f"{count:>8} {loop_time * 1e3:>9.2f} {batch_time * 1e3:>9.2f} "
+              f"{loop_time / batch_time:>7.1f}x  {loop_scores == batch_scores.tolist()}")
+
+
+def benchmark_whole_upload(query_lengths=(100_000, 300_000, 1_000_000)):
+    """Locate and align the reference inside long uploads without any window heuristic"""
+    rng = random.Random(3)
+    print("\n=== Whole-upload alignment: semi_global / smith_waterman ===")
+    print(f"{'query':>9} {'semi s':>8} {'semi Mc/s':>10} {'local s':>8} {'local Mc/s':>11}  found")
+    for length in query_lengths:
+        core = make_window(len(REFERENCE), rng)
+        position = rng.randrange(length - len(core))
+        query = random_sequence(position, rng) + core + random_sequence(length - position - len(core), rng)
+        cells = (len(query) + 1) * (len(REFERENCE) + 1)
+        semi_time, semi_result = time_call(semi_global, query, REFERENCE, repeat=1)
+        local_time, local_result = time_call(smith_waterman, query, REFERENCE, repeat=1)
+        found = abs(semi_result['query_start'] - position) <= 3 and abs(local_result['query_start'] - position) <= 3
+        print(f"{len(query):>9} {semi_time:>8.3f} {cells / semi_time / 1e6:>10.1f} "
+              f"{local_time:>8.3f} {cells / local_time / 1e6:>11.1f}  {found}")
+
+
+def benchmark_region_search(query_lengths=(100_000, 1_000_000, 4_000_000), max_edits=18):
+    """Locate the reference with the bit-parallel scanner vs a full semi-global pass"""
+    rng = random.Random(13)
+    print(f"\n=== Region search: find_approximate (k={max_edits}) vs semi_global ===")
+    print(f"{'query':>9} {'myers s':>8} {'myers Mb/s':>11} {'semi s':>8} {'speedup':>8}  found")
+    for length in query_lengths:
+        core = make_window(len(REFERENCE), rng)
+        position = rng.randrange(length - len(core))
+        query = random_sequence(position, rng) + core + random_sequence(length - position - len(core), rng)
+        myers_time, (ends, distances) = time_call(find_approximate, query, REFERENCE, max_edits, repeat=1)
+        semi_time, semi_result = time_call(semi_global, query, REFERENCE, repeat=1)
+        found = len(ends) > 0 and abs(int(ends[distances.argmin()]) - semi_result['query_end']) <= 3
+        print(f"{length:>9} {myers_time:>8.3f} {length / myers_time / 1e6:>11.1f} "
+              f"{semi_time:>8.3f} {semi_time / myers_time:>7.1f}x  {found}")
+
+
+def benchmark_batch(query_counts=(10, 100, 500), window=290):
+    """One reference against many analyzer-sized windows: per-call loops vs align_many"""
+    rng = random.Random(17)
+    print("\n=== Batch alignment: needleman_wunsch / needleman_wunsch_numpy loops vs align_many ===")
+    print(f"{'queries':>8} {'python q/s':>11} {'numpy q/s':>10} {'batch q/s':>10} {'vs python':>10}  same")
+    for count in query_counts:
+        queries = [make_window(window + rng.randint(-20, 20), rng) for _ in range(count)]
+        py_time, py_results = time_call(
+            lambda: [needleman_wunsch(query, REFERENCE) for query in queries], repeat=1)
+        np_time, _ = time_call(lambda: [needleman_wunsch_numpy(query, REFERENCE) for query in queries], repeat=1)
+        batch_time, batch_results = time_call(align_many, REFERENCE, queries)
+        print(f"{count:>8} {count / py_time:>11,.0f} {count / np_time:>10,.0f} {count / batch_time:>10,.0f} "
+              f"{py_time / batch_time:>9.1f}x  {py_results == batch_results}")
+
+
+def benchmark_backends(lengths=(92, 290, 1000)):
+    """Check every registered backend against needleman_wunsch, then time it"""
+    rng = random.Random(19)
+    print("\n=== Alignment backends ===")
+    failures = check_backends()
+    for name, cases in failures.items():
+        print(f"{name:>12}: {'identical' if not cases else f'{len(cases)} differing cases'}")
+    print(f"{'query':>8} " + ' '.join(f"{name + ' ms':>14}" for name in ALIGNMENT_BACKENDS))
+    for length in lengths:
+        query = make_window(length, rng)
+        times = [time_call(backend, query, REFERENCE, 1, -1, -2)[0] for backend in ALIGNMENT_BACKENDS.values()]
+        print(f"{len(query):>8} " + ' '.join(f"{t * 1e3:>14.2f}" for t in times))
+
+
+def benchmark_compact_encoding(window_lengths=(92, 290, 1000, 10000), samples=20):
+    """JSON size and serialization time of alignment statistics: full strings vs CIGAR form"""
+    rng = random.Random(23)
+    print("\n=== alignment_statistics payload: full vs compact (CIGAR) ===")
+    print(f"{'window':>7} {'full B':>8} {'compact B':>10} {'ratio':>6} {'full us':>8} {'compact us':>11}  round-trip")
+    for length in window_lengths:
+        results = [needleman_wunsch_numpy(make_window(length, rng), REFERENCE) for _ in range(samples)]
+        compact = [compact_alignment(result) for result in results]
+        full_time, full_json = time_call(lambda: [json.dumps(result) for result in results])
+        compact_time, compact_json = time_call(lambda: [json.dumps(result) for result in compact])
+        full_size = sum(len(doc) for doc in full_json) / samples
+        compact_size = sum(len(doc) for doc in compact_json) / samples
+        round_trip = all(expand_alignment(c, REFERENCE) == {**r, 'reference_start': 0, 'reference_end': len(REFERENCE)}
+                         for c, r in zip(compact, results))
+        print(f"{length:>7} {full_size:>8.0f} {compact_size:>10.0f} {full_size / compact_size:>5.1f}x "
+              f"{full_time / samples * 1e6:>8.1f} {compact_time / samples * 1e6:>11.1f}  {round_trip}")
+
+
+def scan_aligned_index(aligned_seq, relative_index):
+    """The original linear scan of mutation_analysis.get_aligned_index, without logging."""
+    non_gap_count = 0
+    for i, base in enumerate(aligned_seq):
+        if base != '-':
+            if non_gap_count == relative_index:
+                return i
+            non_gap_count += 1
+    return -1
+
+
+def benchmark_coordinates(window_lengths=(290, 10000), lookups=(10, 1000)):
+    """Map query positions to aligned columns: repeated scans vs one AlignmentCoordinates"""
+    rng = random.Random(29)
+    print("\n=== Position mapping: per-lookup scan vs AlignmentCoordinates batch lookup ===")
+    print(f"{'window':>7} {'lookups':>8} {'scan ms':>9} {'index ms':>9} {'speedup':>8}  same")
+    for length in window_lengths:
+        result = needleman_wunsch_numpy(make_window(length, rng), REFERENCE)
+        aligned = result['aligned_seq1']
+        for count in lookups:
+            positions = [rng.randrange(length) for _ in range(count)]
+            scan_time, scanned = time_call(lambda: [scan_aligned_index(aligned, p) for p in positions])
+            index_time, indexed = time_call(
+                lambda: AlignmentCoordinates(aligned, result['aligned_seq2']).query_to_aligned(positions))
+            print(f"{length:>7} {count:>8} {scan_time * 1e3:>9.3f} {index_time * 1e3:>9.3f} "
+                  f"{scan_time / index_time:>7.1f}x  {scanned == indexed.tolist()}")
+
+
+def loop_differences(aligned_query, aligned_ref):
+    """
+    The old per-base _find_mutations walk, extended to list every substitution
+    and gap column instead of stopping at the first expected SNP.
+    """
+    differences = []
+    query_index = 0
+    for i, (ref_base, query_base) in enumerate(zip(aligned_ref, aligned_query)):
+        if ref_base != '-':
+            if query_base != '-':
+                if ref_base != query_base:
+                    logger.info(f"Found mutation at position {i}: {ref_base} -> {query_base}")
+                    differences.append(('X', i, query_index))
+                query_index += 1
+            else:
+                differences.append(('D', i, query_index))
+        else:
+            differences.append(('I', i, query_index))
+            query_index += 1
+    return differences
+
+
+def benchmark_variant_calling(lengths=(92, 1000, 10000, 50000)):
+    """Find every difference in an alignment: per-base loop vs vectorized call_variants"""
+    rng = random.Random(31)
+    print("\n=== Variant calling: per-base loop vs call_variants ===")
+    print(f"{'length':>7} {'loop ms':>9} {'vector ms':>10} {'speedup':>8} {'variants':>9}")
+    for length in lengths:
+        reference = REFERENCE if length == len(REFERENCE) else random_sequence(length, rng)
+        query = mutate(reference, rng, substitutions=max(1, length // 20), indels=max(1, length // 200))
+        # Near-identical pairs: the banded engine builds the alignment quickly
+        result = banded_needleman_wunsch(query, reference)
+        aligned_query, aligned_ref = result['aligned_seq1'], result['aligned_seq2']
+        loop_time, _ = time_call(loop_differences, aligned_query, aligned_ref)
+        vector_time, variants = time_call(call_variants, aligned_query, aligned_ref)
+        print(f"{length:>7} {loop_time * 1e3:>9.3f} {vector_time * 1e3:>10.3f} "
+              f"{loop_time / vector_time:>7.1f}x {len(variants['type']):>9}")
+
+
+def large_random_sequence(length, seed):
+    """Random ACGT string built with NumPy (multi-megabase inputs)."""
+    codes = np.random.default_rng(seed).integers(0, 4, length, dtype=np.uint8)
+    return np.frombuffer(b'ACGT', dtype=np.uint8)[codes].tobytes().decode('ascii')
+
+
+def benchmark_seed_index(megabases=(1, 10, 50), myers_limit=10):
+    """Locate a mutated panel region in 1-50 Mb uploads: 20-mer anchor, Myers scan, seed index"""
+    rng = random.Random(37)
+    panel = {'HBB': REFERENCE}
+    panel.update({f'ref{i}': random_sequence(90, rng) for i in range(11)})
+    index = KmerIndex(panel)
+    print("\n=== Region location: str.find anchor vs find_approximate vs KmerIndex (12-reference panel) ===")
+    print(f"{'Mb':>4} {'anchor s':>9} {'found':>6} {'myers s':>8} {'index s':>8} {'index Mb/s':>11} {'votes':>6}  found")
+    for size in megabases:
+        length = size * 1_000_000
+        core = list(REFERENCE)
+        core[3] = 'A' if core[3] != 'A' else 'C'  # variant inside the 20-mer anchor
+        del core[50]
+        position = rng.randrange(length - len(core))
+        background = large_random_sequence(length, size)
+        query = background[:position] + ''.join(core) + background[position + len(core) - 1:]
+        anchor_time, anchor = time_call(query.find, REFERENCE[:20], repeat=1)
+        if size <= myers_limit:
+            myers_time = f"{time_call(find_approximate, query, REFERENCE, 18, repeat=1)[0]:>8.3f}"
+        else:
+            myers_time = f"{'-':>8}"
+        index_time, candidates = time_call(index.candidates, query, repeat=1)
+        best = candidates['HBB'][0]
+        print(f"{size:>4} {anchor_time:>9.3f} {str(anchor != -1):>6} {myers_time} {index_time:>8.3f} "
+              f"{size / index_time:>11.1f} {best['votes']:>6}  {abs(best['start'] - position) <= 2}")
+
+
+def benchmark_strands(megabases=(1, 10)):
+    """Locate a minus-strand copy of HBB: forward-only seed index vs both strands in one scan"""
+    rng = random.Random(41)
+    panel = {'HBB': REFERENCE}
+    panel.update({f'ref{i}': random_sequence(90, rng) for i in range(11)})
+    forward, both = KmerIndex(panel), KmerIndex(panel, both_strands=True)
+    print("\n=== Minus-strand upload: KmerIndex forward only vs both_strands ===")
+    print(f"{'Mb':>4} {'forward s':>10} {'votes':>6} {'both s':>8} {'votes':>6} {'strand':>7}  found")
+    for size in megabases:
+        length = size * 1_000_000
+        position = rng.randrange(length - len(REFERENCE))
+        background = large_random_sequence(length, size + 100)
+        query = background[:position] + reverse_complement(REFERENCE) + background[position + len(REFERENCE):]
+        forward_time, forward_hits = time_call(forward.candidates, query, repeat=1)
+        both_time, both_hits = time_call(both.candidates, query, repeat=1)
+        forward_votes = forward_hits['HBB'][0]['votes'] if 'HBB' in forward_hits else 0
+        best = both_hits['HBB'][0]
+        print(f"{size:>4} {forward_time:>10.3f} {forward_votes:>6} {both_time:>8.3f} {best['votes']:>6} "
+              f"{best['strand']:>7}  {best['start'] == position}")
+
+
+def strided_best_window(sequence, reference):
+    """The original fallback: Python match counts at a stride of window_len // 10."""
+    best = 0
+    for i in range(0, len(sequence) - len(reference) + 1, max(1, len(reference) // 10)):
+        best = max(best, sum(1 for a, b in zip(sequence[i:i + len(reference)], reference) if a == b))
+    return best
+
+
+def benchmark_ungapped_scan(query_lengths=(10_000, 100_000, 1_000_000, 10_000_000), strided_limit=1_000_000):
+    """Best ungapped window of the HBB reference: strided Python loop vs FFT cross-correlation"""
+    print("\n=== Best-window fallback: strided Python loop vs ungapped_matches (FFT) ===")
+    print(f"{'query':>10} {'strided s':>10} {'best':>5} {'fft s':>8} {'best':>5}")
+    for length in query_lengths:
+        query = large_random_sequence(length, length % 97)
+        if length <= strided_limit:
+            strided_time, strided = time_call(strided_best_window, query, REFERENCE, repeat=1)
+            strided_columns = f"{strided_time:>10.3f} {strided:>5}"
+        else:
+            strided_columns = f"{'-':>10} {'-':>5}"
+        fft_time, counts = time_call(ungapped_matches, query, REFERENCE, repeat=1)
+        print(f"{length:>10} {strided_columns} {fft_time:>8.3f} {int(counts.max()):>5}")
+
+
+def write_fasta(path, chromosomes, megabases, line_length=80):
+    """Write a random multi-chromosome FASTA without holding it in memory (line_length must divide 1 Mb)."""
+    with open(path, 'w') as f:
+        for number in range(1, chromosomes + 1):
+            f.write(f">chr{number}\n")
+            for block in range(megabases):
+                sequence = large_random_sequence(1_000_000, number * 1000 + block)
+                f.write('\n'.join(sequence[i:i + line_length] for i in range(0, len(sequence), line_length)) + '\n')
+    return chromosomes * megabases * 1_000_000
+
+
+def benchmark_reference_genome(chromosomes=4, megabases=60, fetches=1000, flank=100):
+    """Fetch flanked SNP regions from a memory-mapped FASTA vs reading the whole file"""
+    rng = random.Random(43)
+    print(f"\n=== Reference genome: mmap + .fai region fetch ({chromosomes} x {megabases} Mb FASTA) ===")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'genome.fa')
+        total = write_fasta(path, chromosomes, megabases)
+        index_time, genome = time_call(ReferenceGenome, path, repeat=1)
+        genome.close()
+        open_time, genome = time_call(ReferenceGenome, path, repeat=1)
+        regions = [(f"chr{rng.randint(1, chromosomes)}", rng.randrange(1, megabases * 1_000_000 - 300)) for _ in range(fetches)]
+        tracemalloc.start()
+        fetch_time, _ = time_call(lambda: [genome.fetch(name, start - flank, start + 92 + flank) for name, start in regions], repeat=1)
+        fetch_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        genome.close()
+
+        def read_whole():
+            with open(path) as f:
+                return f.read()
+        read_time, _ = time_call(read_whole, repeat=1)
+        print(f"{'bases':>12} {'build .fai s':>13} {'open s':>8} {'fetch us':>9} {'fetch peak KB':>14} {'read file s':>12} {'file MB':>8}")
+        print(f"{total:>12} {index_time:>13.2f} {open_time:>8.4f} {fetch_time / fetches * 1e6:>9.1f} "
+              f"{fetch_peak / 1024:>14.1f} {read_time:>12.2f} {os.path.getsize(path) / 1e6:>8.0f}")
+
+
+def benchmark_upload_index(megabases=(1, 10, 100)):
+    """FM-index build cost vs per-query savings of seed lookups for the 12-reference panel"""
+    rng = random.Random(47)
+    panel = {'HBB': REFERENCE}
+    panel.update({f'ref{i}': random_sequence(90, rng) for i in range(11)})
+    index = KmerIndex(panel, both_strands=True)
+    print("\n=== Upload FM-index: build once vs rescan per query (KmerIndex.candidates) ===")
+    print(f"{'Mb':>4} {'build s':>8} {'index MB':>9} {'scan s':>7} {'indexed s':>10} {'same':>5} {'break-even':>11}")
+    for size in megabases:
+        query = large_random_sequence(size * 1_000_000, size + 7)
+        build_time, fm = time_call(FMIndex, query, repeat=1)
+        scan_time, scanned = time_call(index.candidates, query, repeat=1)
+        indexed_time, indexed = time_call(lambda: index.candidates(query, text_index=fm))
+        queries = build_time / max(scan_time - indexed_time, 1e-9)
+        print(f"{size:>4} {build_time:>8.2f} {fm.nbytes / 1e6:>9.0f} {scan_time:>7.3f} {indexed_time:>10.4f} "
+              f"{str(scanned == indexed):>5} {queries:>10.1f}q")
+        del fm
+
+
+def benchmark_incremental(megabases=(1, 10), edits=(1, 10, 100)):
+    """Re-upload with a few edits: per-chunk cached seed hits vs a full rescan"""
+    rng = random.Random(59)
+    panel = {'HBB': REFERENCE}
+    panel.update({f'ref{i}': random_sequence(90, rng) for i in range(11)})
+    index = KmerIndex(panel, both_strands=True)
+    print("\n=== Incremental re-upload: content-defined chunk cache vs full seed scan ===")
+    print(f"{'Mb':>4} {'edits':>6} {'scan s':>7} {'first s':>8} {'reupload s':>11} {'rescanned':>10} {'same':>5}")
+    for size in megabases:
+        query = large_random_sequence(size * 1_000_000, size + 11)
+        for count in edits:
+            cache = ChunkSeedCache()
+            first_time, _ = time_call(cache.candidates, index, query, repeat=1)
+            # Substitutions and small indels at random places
+            edited = query
+            for _ in range(count):
+                position = rng.randrange(len(edited))
+                edited = edited[:position] + random_sequence(rng.randint(0, 3), rng) + edited[position + rng.randint(0, 3):]
+            scan_time, scanned = time_call(index.candidates, edited, repeat=1)
+            reupload_time, (cached, report) = time_call(cache.candidates, index, edited, repeat=1)
+            rescanned = report["scanned_bases"] / len(edited) * 100
+            print(f"{size:>4} {count:>6} {scan_time:>7.3f} {first_time:>8.3f} {reupload_time:>11.3f} "
+                  f"{rescanned:>9.1f}% {str(scanned == cached):>5}")
+    # Uploads shorter than a few hash windows: chunks must tile them and agree with a scan
+    short = range(1, 2 * _CHUNK_WINDOW + 1)
+    uploads = [REFERENCE[:length] for length in short] + [random_sequence(length, rng) for length in short]
+    cache = ChunkSeedCache()
+    tiled = all(content_chunks(upload)[0] == 0 and content_chunks(upload)[-1] == len(upload) for upload in uploads)
+    same = all(cache.candidates(index, upload)[0] == index.candidates(upload) for upload in uploads)
+    print(f"uploads of 1-{2 * _CHUNK_WINDOW} bases: chunks tile them {tiled}, same as scan {same}")
+
+
+def benchmark_exact_genotyping(uploads_per_trait=20, flank=2000):
+    """Genotype located regions: exact allele match vs window alignment, and the fast-path hit rate"""
+    logging.disable(logging.WARNING)
+    rng = random.Random(53)
+    analyzer = MutationAnalyzer()
+    exact_time = aligned_time = 0.0
+    windows = 0
+    for row, snp in enumerate(analyzer.snps_db["snps"]):
+        reference = analyzer.references[analyzer.reference_rows[row]][0]
+        versions = list(analyzer._alleles(row)["+"])
+        for number in range(uploads_per_trait):
+            # Mostly verbatim alleles, every fourth upload with a substitution elsewhere
+            region = rng.choice(versions)
+            if number % 4 == 3:
+                region = mutate(region, rng, 1, 0)
+            window = random_sequence(100, rng) + region + random_sequence(100, rng)
+            exact_time += time_call(analyzer._exact_region, window, 100, "+", row, repeat=1)[0]
+            exact = analyzer._exact_region(window, 100, "+", row)
+            if exact:
+                exact_time += time_call(ungapped_alignment, window[exact[0]:exact[0] + len(reference)], reference, repeat=1)[0]
+            aligned_time += time_call(planned_alignment, window, reference, repeat=1)[0]
+            windows += 1
+        query = random_sequence(flank, rng) + versions[0] + random_sequence(flank, rng)
+        analyzer.analyze_sequence(query, snp)
+        analyzer.analyze_sequence(mutate(query, rng, 0, 2), snp)
+    logging.disable(logging.NOTSET)
+    print("\n=== Exact-match genotyping fast path vs window alignment ===")
+    print(f"{'windows':>8} {'exact us':>9} {'aligned us':>11} {'speedup':>8}")
+    print(f"{windows:>8} {exact_time / windows * 1e6:>9.1f} {aligned_time / windows * 1e6:>11.1f} "
+          f"{aligned_time / exact_time:>7.0f}x")
+    print(f"analyze_sequence counters: {analyzer.fast_path_stats()}")
+
+
+def benchmark_parallel_scan(megabases=50, myers_megabases=10, worker_counts=(1, 2, 4, 8, 16)):
+    """Chunk-parallel seed and Myers scans over shared memory, 1-16 worker processes"""
+    rng = random.Random(59)
+    panel = {'HBB': REFERENCE}
+    panel.update({f'ref{i}': random_sequence(90, rng) for i in range(11)})
+    index = KmerIndex(panel, both_strands=True)
+    query = large_random_sequence(megabases * 1_000_000, 59)
+    myers_query = query[:myers_megabases * 1_000_000]
+    print(f"\n=== Chunk-parallel scans ({os.cpu_count()} CPU cores available) ===")
+    print(f"{'workers':>8} {f'seeds {megabases}Mb s':>15} {'speedup':>8} {f'myers {myers_megabases}Mb s':>15} {'speedup':>8} {'same':>5}")
+    base_seeds, seeds = time_call(index.candidates, query, 5, None, 1, repeat=1)
+    base_myers, myers = time_call(find_approximate, myers_query, REFERENCE, 18, 1, repeat=1)
+    for workers in worker_counts:
+        if workers == 1:
+            seed_time, myers_time, same = base_seeds, base_myers, True
+        else:
+            index.candidates(query[:PARALLEL_SCAN_MIN_LENGTH], workers=workers)  # start the pool
+            seed_time, parallel_seeds = time_call(index.candidates, query, 5, None, workers, repeat=1)
+            myers_time, parallel_myers = time_call(find_approximate, myers_query, REFERENCE, 18, workers, repeat=1)
+            same = parallel_seeds == seeds and all((a == b).all() for a, b in zip(parallel_myers, myers))
+        print(f"{workers:>8} {seed_time:>15.3f} {base_seeds / seed_time:>7.2f}x {myers_time:>15.3f} "
+              f"{base_myers / myers_time:>7.2f}x {str(same):>5}")
+
+
+def benchmark_panel(megabases=(1, 5)):
+    """Analyze every SNP-database trait: one panel call vs one call per trait"""
+    logging.disable(logging.WARNING)
+    analyzer = MutationAnalyzer()
+    snps = analyzer.snps_db["snps"]
+    print(f"\n=== Whole-panel analysis: analyze_sequence(trait_info=None) vs {len(snps)} single-trait calls ===")
+    print(f"{'Mb':>4} {'panel s':>8} {'per-trait s':>12} {'speedup':>8} {'detected':>9} {'matches':>8}")
+    for size in megabases:
+        length = size * 1_000_000
+        background = large_random_sequence(length, size)
+        # Plant half of the panel's references, evenly spaced
+        planted = snps[::2]
+        step = length // (len(planted) + 1)
+        parts, cursor = [], 0
+        for number, snp in enumerate(planted, 1):
+            parts += [background[cursor:number * step], snp["reference_sequence"].upper()]
+            cursor = number * step
+        query = ''.join(parts) + background[cursor:]
+        analyzer.alignment_cache.invalidate()
+        panel_time, panel = time_call(analyzer.analyze_sequence, query, repeat=1)
+        analyzer.alignment_cache.invalidate()
+        single_time, _ = time_call(lambda: [analyzer.analyze_sequence(query, snp) for snp in snps], repeat=1)
+        detected = sum(trait["detected"] for trait in panel["traits"].values())
+        print(f"{size:>4} {panel_time:>8.3f} {single_time:>12.3f} {single_time / panel_time:>7.1f}x "
+              f"{detected:>9} {len(panel['matches']):>8}")
+    logging.disable(logging.NOTSET)
+
+def synthetic_snps(count, rng):
+    """SNP database entries shaped like data/snps_db.json, with long text fields."""
+    bases = 'ACGT'
+    snps = []
+    for number in range(count):
+        position = rng.randrange(1, 200_000_000)
+        snps.append({
+            "gene": f"GENE{number % 2000}", "position": position,
+            "reference": rng.choice(bases), "variant": rng.choice(bases), "rsid": f"rs{number + 1000}",
+            "trait": f"Trait {number % 500}", "effect": f"Effect of variant {number} " * 4,
+            "description": f"Description of variant {number} and its consequences. " * 8,
+            "reference_sequence": random_sequence(90, rng), "chromosome": str(number % 22 + 1),
+            "position_start": position - 40, "position_end": position + 49
+        })
+    return snps
+
+
+def benchmark_snp_catalog(counts=(10_000, 100_000), lookups=100):
+    """Load the SNP database: json.load of the JSON vs mapping a compiled catalog, and analyzer startup over it"""
+    rng = random.Random(61)
+    print("\n=== SNP database load: JSON vs memory-mapped catalog ===")
+    print(f"{'SNPs':>8} {'json s':>7} {'json MB':>8} {'open s':>8} {'open MB':>8} {'file MB':>8} "
+          f"{'scan pos s':>11} {f'{lookups} texts s':>12} {'analyzer s':>11}")
+    with tempfile.TemporaryDirectory() as directory:
+        for count in counts:
+            json_path = os.path.join(directory, f"snps_{count}.json")
+            catalog_path = os.path.join(directory, f"snps_{count}.bin")
+            with open(json_path, 'w') as f:
+                json.dump({"snps": synthetic_snps(count, rng), "metadata": {}}, f)
+            build_catalog(json_path, catalog_path)
+
+            def load_json():
+                with open(json_path) as f:
+                    return json.load(f)
+            json_time, _ = time_call(load_json, repeat=1)
+            json_memory = peak_memory(load_json)
+            open_time, catalog = time_call(SnpCatalog, catalog_path)
+            open_memory = peak_memory(SnpCatalog, catalog_path)
+            scan_time, _ = time_call(lambda: int((catalog.column('position') > 100_000_000).sum()))
+            rows = [rng.randrange(count) for _ in range(lookups)]
+            text_time, _ = time_call(lambda: [catalog[row]['description'] for row in rows])
+            # Analyzer startup over the catalog: row indexes, references and the seed index
+            configured, mutation_analysis.SNP_CATALOG = mutation_analysis.SNP_CATALOG, catalog_path
+            logging.disable(logging.WARNING)
+            try:
+                startup_time, _ = time_call(MutationAnalyzer, repeat=1)
+            finally:
+                mutation_analysis.SNP_CATALOG = configured
+                logging.disable(logging.NOTSET)
+            print(f"{count:>8} {json_time:>7.3f} {json_memory / 1e6:>8.1f} {open_time:>8.5f} {open_memory / 1e6:>8.3f} "
+                  f"{catalog.nbytes / 1e6:>8.1f} {scan_time:>11.5f} {text_time:>12.5f} {startup_time:>11.3f}")
+            del catalog
+
+def benchmark_snp_index(counts=(1_000, 100_000), queries=1000, span=300):
+    """Known SNPs inside aligned windows: (chromosome, position) index vs a linear scan of the database"""
+    rng = random.Random(67)
+    print("\n=== SNPs in a window: sorted position index vs linear scan ===")
+    print(f"{'SNPs':>8} {'build s':>8} {'scan ms/q':>10} {'index ms/q':>11} {'same':>5}")
+    for count in counts:
+        snps = synthetic_snps(count, rng)
+        build_time, index = time_call(PositionIndex, snps, repeat=1)
+        windows = []
+        for _ in range(queries):
+            snp = rng.choice(snps)
+            start = snp["position"] - rng.randrange(span)
+            windows.append((snp["chromosome"], start, start + span - 1))
+
+        def linear():
+            return [[row for row, snp in enumerate(snps)
+                     if snp["chromosome"] == chromosome and start <= snp["position"] <= end]
+                    for chromosome, start, end in windows]
+
+        def indexed():
+            return [sorted(index.overlapping(chromosome, start, end).tolist()) for chromosome, start, end in windows]
+        scan_time, scanned = time_call(linear, repeat=1)
+        index_time, found = time_call(indexed)
+        print(f"{count:>8} {build_time:>8.3f} {scan_time / queries * 1e3:>10.3f} {index_time / queries * 1e3:>11.4f} "
+              f"{str(scanned == found):>5}")
+
+def write_genotype_file(path, snps, rows, rng, known_fraction=0.05):
+    """Consumer-style genotype export: '#' comments, a header, then rsid/chromosome/position/genotype rows."""
+    with open(path, 'w') as f:
+        f.write("# synthetic genotype export\nrsid\tchromosome\tposition\tgenotype\n")
+        for number in range(rows):
+            if rng.random() < known_fraction:
+                snp = rng.choice(snps)
+                alleles = rng.choice([snp["reference"], snp["variant"]]) + rng.choice([snp["reference"], snp["variant"]])
+                f.write(f"{snp['rsid']}\t{snp['chromosome']}\t{snp['position']}\t{alleles}\n")
+            else:
+                f.write(f"rs{900_000_000 + number}\t{rng.randint(1, 22)}\t{rng.randrange(1, 200_000_000)}\t"
+                        f"{rng.choice(('AA', 'AG', 'CC', 'CT', 'GG', 'TT', '--'))}\n")
+
+
+def benchmark_genotype_import(catalog_snps=100_000, rows=(100_000, 600_000)):
+    """Streaming genotype-file join against the SNP database: rows/s and peak memory vs file size"""
+    rng = random.Random(71)
+    snps = synthetic_snps(catalog_snps, rng)
+    index_time, index = time_call(GenotypeIndex, snps, repeat=1)
+    print(f"\n=== Genotype file import ({catalog_snps} SNPs, join index built in {index_time:.2f}s) ===")
+    print(f"{'rows':>8} {'file MB':>8} {'seconds':>8} {'rows/s':>10} {'peak MB':>8} {'variant matches':>16}")
+    with tempfile.TemporaryDirectory() as directory:
+        for count in rows:
+            path = os.path.join(directory, f"genotypes_{count}.txt")
+            write_genotype_file(path, snps, count, rng)
+
+            def run():
+                with open(path, 'rb') as f:
+                    return import_genotypes(f, index)
+            seconds, result = time_call(run)
+            peak = peak_memory(run)
+            print(f"{count:>8} {os.path.getsize(path) / 1e6:>8.1f} {seconds:>8.3f} {count / seconds:>10.0f} "
+                  f"{peak / 1e6:>8.1f} {len(result['matches']):>16}")
+
+
+if __name__ == "__main__":
+    benchmark_engines()
+    benchmark_linear_memory()
+    benchmark_banded()
+    benchmark_score_only()
+    benchmark_whole_upload()
+    benchmark_region_search()
+    benchmark_batch()
+    benchmark_backends()
+    benchmark_compact_encoding()
+    benchmark_coordinates()
+    benchmark_variant_calling()
+    benchmark_seed_index()
+    benchmark_strands()
+    benchmark_ungapped_scan()
+    benchmark_panel()
+    benchmark_upload_index()
+    benchmark_incremental()
+    benchmark_exact_genotyping()
+    benchmark_parallel_scan()
+    benchmark_reference_genome()
+    benchmark_snp_catalog()
+    benchmark_snp_index()
+    benchmark_genotype_import()
@@ -0,0 +1,284 @@
+"""
+FM-index over an uploaded sequence, for repeated exact lookups.
+"""
+
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+from alignment import _encode
+
+# Memory budget for the FM-indexes of recent uploads (0 disables indexing); an
+# upload is only indexed if the peak memory of its build fits in it as well
+UPLOAD_INDEX_BYTES = int(os.getenv("UPLOAD_INDEX_BYTES", str(256 << 20)))
+
+# Index an upload once it has been analyzed this many times: a build costs about
+# six full seed scans, so one-off uploads are scanned and repeated ones indexed
+UPLOAD_INDEX_AFTER = int(os.getenv("UPLOAD_INDEX_AFTER", "2"))
+
+# Number of upload digests whose request counts are remembered
+_TRACKED_UPLOADS = 1024
+
+# Every SA_SAMPLE-th text position keeps its suffix-array entry; the others are
+# recovered with at most SA_SAMPLE - 1 LF steps
+SA_SAMPLE = 16
+
+# Peak working memory of an index build per base, reached by the suffix-array
+# rounds on highly repetitive text (random text peaks at about 21 bytes per base)
+BUILD_BYTES_PER_BASE = 64
+
+# Symbols packed into the initial sort key of the suffix-array construction (3 bits each)
+_KEY_SYMBOLS = 21
+
+# Sentinel 0, A C G T (any case) 1-4, anything else 5
+_SYMBOLS = np.full(256, 5, dtype=np.uint8)
+for _code, _base in enumerate(b'ACGT', 1):
+    _SYMBOLS[_base] = _code
+    _SYMBOLS[_base + 32] = _code
+_ALPHABET = 6
+
+if hasattr(np, 'bitwise_count'):
+    _popcount = np.bitwise_count
+else:
+    _BYTE_COUNTS = np.array([bin(value).count('1') for value in range(256)], dtype=np.uint8)
+
+    def _popcount(words):
+        words = np.ascontiguousarray(words, dtype=np.uint64)
+        return _BYTE_COUNTS[words.view(np.uint8)].reshape(words.shape + (8,)).sum(axis=-1, dtype=np.uint8)
+
+
+def _symbols(sequence):
+    return _SYMBOLS[_encode(sequence) & 0xFF]
+
+
+def suffix_array(symbols):
+    """
+    Suffix array of a symbol array that ends with a unique smallest sentinel.
+
+    Prefix doubling: suffixes are sorted by their first _KEY_SYMBOLS symbols in
+    one pass, then only groups that are still tied are re-sorted by
+    (rank, rank of the suffix h positions later), doubling h each round.
+    """
+    n = len(symbols)
+    padded = np.concatenate((symbols, np.zeros(_KEY_SYMBOLS, dtype=np.uint8))).astype(np.uint64)
+    key = np.zeros(n, dtype=np.uint64)
+    for j in range(_KEY_SYMBOLS):
+        key <<= np.uint64(3)
+        key |= padded[j:j + n]
+    del padded
+    index_type = np.int32 if n < (1 << 31) else np.int64
+    sa = np.argsort(key).astype(index_type)  # ties are resolved by the rounds below
+    sorted_key = key[sa]
+    del key
+
+    # Rank of a suffix = position of its group's first member in the sorted order
+    new_group = np.ones(n, dtype=bool)
+    new_group[1:] = sorted_key[1:] != sorted_key[:-1]
+    del sorted_key
+    group_start = np.maximum.accumulate(np.where(new_group, np.arange(n, dtype=index_type), 0))
+    rank = np.empty(n, dtype=index_type)
+    rank[sa] = group_start
+
+    h = _KEY_SYMBOLS
+    while True:
+        # Sorted positions that belong to groups of two or more
+        tied = ~new_group
+        tied[:-1] |= ~new_group[1:]
+        rows = np.flatnonzero(tied)
+        if len(rows) == 0:
+            return sa
+        suffixes = sa[rows]
+        first = rank[suffixes]
+        second = np.where(suffixes + h < n, rank[np.minimum(suffixes + h, n - 1)], -1)
+        order = np.lexsort((second, first))
+        suffixes, first, second = suffixes[order], first[order], second[order]
+        sa[rows] = suffixes
+        boundary = np.ones(len(rows), dtype=bool)
+        boundary[1:] = (first[1:] != first[:-1]) | (second[1:] != second[:-1])
+        new_group[rows] = boundary
+        rank[suffixes] = np.maximum.accumulate(np.where(boundary, rows, 0)).astype(index_type)
+        h *= 2
+
+
+class _RankBits:
+    """Bit vector with constant-time rank (number of set bits before a position)."""
+
+    def __init__(self, mask):
+        words = np.packbits(mask, bitorder='little')
+        words = np.concatenate((words, np.zeros(16 - len(words) % 8, dtype=np.uint8)))
+        self.words = words.view(np.uint64)
+        self.before = np.concatenate(([0], np.cumsum(_popcount(self.words), dtype=np.int64)))
+
+    def rank(self, positions):
+        word = positions >> 6
+        below = np.left_shift(np.uint64(1), (positions & 63).astype(np.uint64)) - np.uint64(1)
+        return self.before[word] + _popcount(self.words[word] & below)
+
+    def get(self, positions):
+        return (self.words[positions >> 6] >> (positions & 63).astype(np.uint64)) & np.uint64(1) == 1
+
+    @property
+    def nbytes(self):
+        return self.words.nbytes + self.before.nbytes
+
+
+class FMIndex:
+    """
+    FM-index of one sequence: its Burrows-Wheeler transform with rank bit
+    vectors per symbol and a sampled suffix array.
+
+    Built once (O(n log n)), it answers how often and where an exact pattern
+    occurs in O(len(pattern)) rank steps plus O(SA_SAMPLE) per reported
+    occurrence, independent of the sequence length. Lookups are vectorized
+    over many equal-length patterns at once. Holds about 3 bytes per base.
+    """
+
+    def __init__(self, sequence, sample_rate=SA_SAMPLE):
+        self.length = len(sequence)
+        self.sample_rate = sample_rate
+        text = np.append(_symbols(sequence), np.uint8(0))
+        sa = suffix_array(text)
+        self.bwt = text[sa - 1]  # sa - 1 == -1 wraps to the sentinel
+        counts = np.bincount(text, minlength=_ALPHABET)
+        self.first = np.concatenate(([0], np.cumsum(counts)[:-1])).astype(np.int64)  # C array
+        self._occurrences = [_RankBits(self.bwt == symbol) for symbol in range(_ALPHABET)]
+        sampled = sa % sample_rate == 0
+        self._sampled = _RankBits(sampled)
+        self._samples = sa[sampled]
+
+    @property
+    def nbytes(self):
+        return (self.bwt.nbytes + self._samples.nbytes + self._sampled.nbytes +
+                sum(bits.nbytes for bits in self._occurrences))
+
+    def _occ(self, symbols, rows):
+        """Occurrences of symbols[i] in bwt[:rows[i]]."""
+        result = np.zeros(len(rows), dtype=np.int64)
+        for symbol in np.unique(symbols):
+            selected = symbols == symbol
+            result[selected] = self._occurrences[symbol].rank(rows[selected])
+        return result
+
+    def ranges(self, patterns):
+        """
+        Suffix-array row ranges [lo, hi) of equal-length patterns (strings, or a
+        2-D array of symbols); hi - lo is each pattern's number of occurrences.
+        """
+        if isinstance(patterns, np.ndarray):
+            codes = patterns
+        else:
+            codes = np.array([_symbols(pattern) for pattern in patterns], dtype=np.uint8).reshape(len(patterns), -1)
+        lo = np.zeros(len(codes), dtype=np.int64)
+        hi = np.full(len(codes), self.length + 1, dtype=np.int64)
+        for column in range(codes.shape[1] - 1, -1, -1):
+            active = np.flatnonzero(lo < hi)
+            if len(active) == 0:
+                break
+            symbols = codes[active, column]
+            lo[active] = self.first[symbols] + self._occ(symbols, lo[active])
+            hi[active] = self.first[symbols] + self._occ(symbols, hi[active])
+        return lo, np.maximum(hi, lo)
+
+    def locate_rows(self, rows):
+        """Text positions of suffix-array rows, walking LF to the nearest sampled row."""
+        rows = np.array(rows, dtype=np.int64)
+        positions = np.zeros(len(rows), dtype=np.int64)
+        pending = np.arange(len(rows))
+        for steps in range(self.sample_rate):
+            current = rows[pending]
+            sampled = self._sampled.get(current)
+            done = pending[sampled]
+            positions[done] = self._samples[self._sampled.rank(current[sampled])] + steps
+            pending, current = pending[~sampled], current[~sampled]
+            if len(pending) == 0:
+                break
+            symbols = self.bwt[current]
+            rows[pending] = self.first[symbols] + self._occ(symbols, current)
+        return positions
+
+    def locate_many(self, patterns):
+        """
+        Every occurrence of equal-length patterns: (pattern index, position)
+        int64 arrays, grouped by pattern.
+        """
+        lo, hi = self.ranges(patterns)
+        counts = hi - lo
+        pattern_ids = np.repeat(np.arange(len(lo)), counts)
+        rows = np.repeat(lo - (np.cumsum(counts) - counts), counts) + np.arange(int(counts.sum()))
+        return pattern_ids, self.locate_rows(rows)
+
+    def count(self, pattern):
+        lo, hi = self.ranges([pattern])
+        return int(hi[0] - lo[0])
+
+    def locate(self, pattern):
+        """Sorted start positions of every exact occurrence of `pattern`."""
+        if not pattern:
+            return np.arange(self.length + 1, dtype=np.int64)
+        return np.sort(self.locate_many([pattern])[1])
+
+
+class UploadIndexes:
+    """
+    Byte-bounded LRU of FM-indexes for recently analyzed uploads.
+
+    Uploads are identified by a hash of their sequence. The index of an upload
+    is built the `build_after`-th time it is requested and then reused by every
+    later request for the same sequence, until evicted.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None, build_after: Optional[int] = None):
+        self.max_bytes = UPLOAD_INDEX_BYTES if max_bytes is None else max_bytes
+        self.build_after = UPLOAD_INDEX_AFTER if build_after is None else build_after
+        self._indexes = OrderedDict()  # digest -> FMIndex
+        self._requests = OrderedDict()  # digest -> number of requests seen
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.hits = 0
+
+    def get(self, sequence: str) -> Optional[FMIndex]:
+        """
+        The FM-index of `sequence`, built now if this request reaches the
+        threshold; None if the upload should just be scanned.
+        """
+        # A built index takes about 3 bytes per base, its build up to BUILD_BYTES_PER_BASE
+        if self.max_bytes < BUILD_BYTES_PER_BASE * (len(sequence) + 1):
+            return None
+        key = hashlib.sha256(sequence.encode('utf-8')).hexdigest()
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is not None:
+                self._indexes.move_to_end(key)
+                self.hits += 1
+                return index
+            requests = self._requests.pop(key, 0) + 1
+            self._requests[key] = requests
+            if len(self._requests) > _TRACKED_UPLOADS:
+                self._requests.popitem(last=False)
+        if requests < self.build_after:
+            return None
+        index = FMIndex(sequence)
+        with self._lock:
+            if key not in self._indexes:
+                self._indexes[key] = index
+                self._bytes += index.nbytes
+                self.builds += 1
+            while self._bytes > self.max_bytes:
+                _, evicted = self._indexes.popitem(last=False)
+                self._bytes -= evicted.nbytes
+        return index
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._indexes),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "builds": self.builds,
+                "hits": self.hits
+            }
@@ -0,0 +1,202 @@
+"""
+Streaming import of consumer genotype files (23andMe / AncestryDNA style exports).
+
+Rows are tab-separated: rsid, chromosome, position and the genotype, either as
+one column ("AG") or as two allele columns ("A", "G"). Lines starting with '#'
+and header lines are skipped. A file is fed in byte chunks as it is received
+and every complete row is joined at once against hash indexes of the SNP
+database, so memory stays bounded by the chunk size plus the rows that match.
+"""
+
+import time
+import logging
+from typing import Any, Dict, Iterable, List, Optional
+
+from snp_catalog import field_values, normalize_chromosome
+
+logger = logging.getLogger(__name__)
+
+# Bytes read from an upload stream at a time
+GENOTYPE_CHUNK_BYTES = 1 << 20
+
+# Genotype calls meaning "not genotyped"
+NO_CALLS = {'--', '-', '00', '0', 'NN', 'N', ''}
+
+_COMPLEMENT = str.maketrans('ACGT', 'TGCA')
+
+
+class GenotypeIndex:
+    """
+    Hash indexes of SNP database rows by rsid and by (chromosome, position),
+    for joining genotype rows in O(1) each. Positions are kept as strings, so
+    rows are joined without converting their positions to integers.
+    """
+
+    def __init__(self, snps):
+        self.snps = snps
+        self.by_rsid = {}
+        self.by_position = {}
+        rsids, chromosomes, positions = (field_values(snps, field) for field in ('rsid', 'chromosome', 'position'))
+        for row, (rsid, chromosome, position) in enumerate(zip(rsids, chromosomes, positions)):
+            if rsid and rsid != 'unknown':
+                self.by_rsid.setdefault(rsid.lower(), []).append(row)
+            if chromosome is not None and position is not None:
+                self.by_position.setdefault((normalize_chromosome(chromosome), str(position)), []).append(row)
+        logger.info(f"Genotype join index: {len(self.by_rsid)} rsids, {len(self.by_position)} positions")
+
+    def rows(self, rsid: str, chromosome: str, position: str) -> List[int]:
+        """Database rows of a genotype row: by rsid, else by (chromosome, position)."""
+        rows = self.by_rsid.get(rsid.lower())
+        if rows is None:
+            rows = self.by_position.get((normalize_chromosome(chromosome), position), [])
+        return rows
+
+
+def _oriented_alleles(genotype: str, reference: str, variant: str) -> Optional[str]:
+    """
+    The genotype's alleles on the strand of the SNP's reference/variant bases;
+    None if they match neither strand. Strand-ambiguous (A/T, C/G) SNPs are
+    never flipped.
+    """
+    expected = {reference, variant}
+    if set(genotype) <= expected:
+        return genotype
+    flipped = genotype.translate(_COMPLEMENT)
+    if set(flipped) <= expected and reference.translate(_COMPLEMENT) != variant:
+        return flipped
+    return None
+
+
+class GenotypeImport:
+    """
+    Incremental genotype-file join: feed() the upload chunk by chunk, then
+    finish() for an analysis result shaped like MutationAnalyzer.analyze_sequence
+    (matches, alignment_statistics, traits) plus an "ingestion" report.
+
+    Matches are the genotyped SNPs carrying their variant allele; "traits" has
+    the genotypes of every genotyped trait SNP, carriers or not.
+    """
+
+    def __init__(self, index: GenotypeIndex, trait_info: Dict[str, Any] = None):
+        self.index = index
+        self.trait_info = trait_info
+        self._pending = b''
+        self._genotyped = {}  # database row -> genotype as given in the file
+        self.rows = 0
+        self.joined_rows = 0
+        self.no_calls = 0
+        self.malformed = 0
+        self.bytes = 0
+        self.seconds = 0.0
+
+    def feed(self, data: bytes) -> None:
+        """Join every complete line of `data` (plus the partial line left from the previous chunk)."""
+        started = time.perf_counter()
+        self.bytes += len(data)
+        data = self._pending + data
+        end = data.rfind(b'\n') + 1
+        self._pending = data[end:]
+        if end:
+            self._join_lines(data[:end].decode('utf-8', errors='replace').splitlines())
+        self.seconds += time.perf_counter() - started
+
+    def _join_lines(self, lines: Iterable[str]) -> None:
+        rows_of = self.index.rows
+        for line in lines:
+            if not line or line[0] == '#':
+                continue
+            fields = line.split('\t')
+            if len(fields) < 4 or not fields[2].strip().isdigit():
+                if not line.lower().startswith(('rsid', 'snp', '"rsid')):
+                    self.malformed += 1
+                continue
+            self.rows += 1
+            rows = rows_of(fields[0].strip(), fields[1].strip(), fields[2].strip())
+            if not rows:
+                continue
+            genotype = ''.join(allele.strip() for allele in fields[3:5]).upper()
+            if genotype in NO_CALLS:
+                self.no_calls += 1
+                continue
+            self.joined_rows += 1
+            for row in rows:
+                self._genotyped[row] = genotype
+
+    def finish(self) -> Dict[str, Any]:
+        """Join the last (unterminated) line and build the analysis result."""
+        started = time.perf_counter()
+        if self._pending:
+            self._join_lines([self._pending.decode('utf-8', errors='replace')])
+            self._pending = b''
+        snps = self.index.snps
+        matches = []
+        traits = {}
+        for row in sorted(self._genotyped):
+            snp = snps[row]
+            if self.trait_info and (snp["trait"] != self.trait_info["trait"] or snp["gene"] != self.trait_info["gene"]):
+                continue
+            genotype = self._genotyped[row]
+            alleles = _oriented_alleles(genotype, snp["reference"], snp["variant"])
+            trait = traits.setdefault(snp["trait"], {"gene": snp["gene"], "detected": True, "strand": "+",
+                                                     "genotypes": {}, "matches": 0})
+            trait["genotypes"][snp["rsid"]] = genotype
+            if alleles is None:
+                trait["warning"] = f"Genotype {genotype} of {snp['rsid']} matches neither {snp['reference']} nor {snp['variant']}"
+                continue
+            copies = alleles.count(snp["variant"])
+            if copies == 0:
+                continue
+            trait["matches"] += 1
+            matches.append({
+                "gene": snp["gene"],
+                "rsid": snp["rsid"],
+                "position": snp["position"],
+                "reference": snp["reference"],
+                "user_value": alleles,
+                "trait": snp["trait"],
+                "effect": snp["effect"],
+                "description": snp["description"],
+                "is_variant": True,
+                "alignment_position": None,
+                "alignment_context": None,
+                "genotype": genotype,
+                "zygosity": "homozygous" if copies == len(alleles) else "heterozygous"
+            })
+        warning = None
+        if self.trait_info and self.trait_info["trait"] not in traits:
+            warning = f"None of the SNPs for {self.trait_info['trait']} were genotyped in your file."
+            logger.warning(warning)
+        self.seconds += time.perf_counter() - started
+        logger.info(f"Genotype import: {self.rows} rows, {self.joined_rows} joined, {len(matches)} variant matches "
+                    f"in {self.seconds:.3f}s")
+        return {
+            "matches": matches,
+            "alignment_statistics": {},
+            "traits": traits,
+            "ingestion": self.stats(),
+            **({"warning": warning} if warning else {})
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """Ingestion counters; no_calls counts rows that joined a SNP but were not genotyped."""
+        return {
+            "rows": self.rows,
+            "joined_rows": self.joined_rows,
+            "no_calls": self.no_calls,
+            "malformed_lines": self.malformed,
+            "bytes": self.bytes,
+            "seconds": self.seconds,
+            "rows_per_second": self.rows / self.seconds if self.seconds else 0.0
+        }
+
+
+def import_genotypes(stream, index: GenotypeIndex, trait_info: Dict[str, Any] = None,
+                     chunk_bytes: int = GENOTYPE_CHUNK_BYTES) -> Dict[str, Any]:
+    """Join a binary file-like object chunk by chunk; see GenotypeImport."""
+    genotype_import = GenotypeImport(index, trait_info)
+    while True:
+        chunk = stream.read(chunk_bytes)
+        if not chunk:
+            break
+        genotype_import.feed(chunk)
+    return genotype_import.finish()
@@ -5,11 +5,13 @@ from fastapi import FastAPI, UploadFile, Form, HTTPException, Depends, status, F
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.responses import FileResponse, Response, JSONResponse
+from fastapi.concurrency import run_in_threadpool
 from Bio import SeqIO
 from io import StringIO, BytesIO
 import re
-from alignment import needleman_wunsch
+from alignment import get_backend, compact_alignment
 from mutation_analysis import MutationAnalyzer
+from genotype_import import GENOTYPE_CHUNK_BYTES
 from datetime import datetime, timedelta
 from database import get_user_by_email, create_user, get_user_by_username, update_user_profile, save_analysis_history, get_user_analysis_history, get_user_by_id, db
 from auth import (
@@ -22,7 +24,7 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, Tabl
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from pathlib import Path
 import json
 from jose import JWTError, jwt
@@ -380,6 +382,15 @@ def calculate_gc_content(sequence: str) -> float:
     total_length = len(sequence)
     return (gc_count / total_length) * 100 if total_length > 0 else 0
 
+ALIGNMENT_FORMATS = ("full", "compact")
+
+def compact_alignment_statistics(alignment_statistics: Dict[str, Any]) -> Dict[str, Any]:
+    """Replace aligned strings with the CIGAR form (alignment.compact_alignment) for every gene."""
+    return {
+        gene: compact_alignment(stats) if "aligned_seq1" in stats else stats
+        for gene, stats in alignment_statistics.items()
+    }
+
 def process_sequence(sequence: str):
     """Process and validate a DNA sequence."""
     sequence = sequence.strip().upper()
@@ -411,11 +422,60 @@ async def get_reference_traits():
         logger.error(f"Error in get_reference_traits: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+INPUT_FORMATS = ("sequence", "genotypes")
+
+async def analyze_genotype_upload(file: Optional[UploadFile], text: Optional[str], trait_info: Optional[str]):
+    """
+    Join a genotype file against the SNP database as it is received, one chunk
+    at a time, so memory does not grow with the file size.
+    """
+    trait_data = None
+    if trait_info:
+        try:
+            trait_data = json.loads(trait_info)
+        except json.JSONDecodeError:
+            raise HTTPException(status_code=400, detail="Invalid trait info format")
+        if not isinstance(trait_data, dict) or "trait" not in trait_data or "gene" not in trait_data:
+            raise HTTPException(status_code=400, detail="Trait info must include trait and gene")
+    if not file and not text:
+        raise HTTPException(status_code=400, detail="No genotype file provided")
+    if file and not file.filename.lower().endswith(('.txt', '.tsv')):
+        raise HTTPException(status_code=400, detail="Invalid file type. Please upload a .txt or .tsv genotype file.")
+
+    genotype_import = await run_in_threadpool(mutation_analyzer.genotype_import, trait_data)
+    if file:
+        logger.info(f"Processing genotype file: {file.filename}")
+        while True:
+            chunk = await file.read(GENOTYPE_CHUNK_BYTES)
+            if not chunk:
+                break
+            await run_in_threadpool(genotype_import.feed, chunk)
+    else:
+        await run_in_threadpool(genotype_import.feed, text.encode('utf-8'))
+    genotype_results = await run_in_threadpool(genotype_import.finish)
+    ingestion = genotype_results["ingestion"]
+    logger.info(f"Genotype file: {ingestion['rows']} rows at {ingestion['rows_per_second']:.0f} rows/s, "
+                f"{len(genotype_results['matches'])} variant matches")
+    if ingestion["rows"] == 0:
+        raise HTTPException(status_code=400, detail="No genotype rows found (expected rsid, chromosome, position, genotype)")
+    return {
+        "inputFormat": "genotypes",
+        "mutations": genotype_results["matches"],
+        "alignment_statistics": {},
+        "traits": genotype_results["traits"],
+        "ingestion": ingestion,
+        **({"warning": genotype_results["warning"]} if "warning" in genotype_results else {})
+    }
+
 @app.post("/analyze")
 async def analyze_dna(
     file: UploadFile = File(None),
     sequence: str = Form(None),
     trait_info: str = Form(None),
+    backend: str = Form(None),
+    alignment_format: str = Form("full"),
+    all_variants: bool = Form(False),
+    input_format: str = Form("sequence"),
     request: Request = None
 ):
     """
@@ -424,6 +484,11 @@ async def analyze_dna(
         file: Optional file containing DNA sequence
         sequence: Optional DNA sequence string
         trait_info: JSON string containing trait information
+        backend: Optional alignment backend name (defaults to ALIGNMENT_BACKEND)
+        alignment_format: "full" (aligned strings) or "compact" (CIGAR edit script)
+        all_variants: Also report every difference in the aligned region, not only the trait SNP
+        input_format: "sequence" (raw DNA) or "genotypes" (consumer genotype export:
+            rsid, chromosome, position, genotype; joined against the SNP database without alignment)
     Returns:
         Analysis results including mutations and alignment statistics
     """
@@ -437,6 +502,11 @@ async def analyze_dna(
     except Exception:
         current_user = None
     try:
+        if input_format not in INPUT_FORMATS:
+            raise HTTPException(status_code=400, detail=f"Invalid input format. Use one of: {', '.join(INPUT_FORMATS)}")
+        if input_format == "genotypes":
+            return await analyze_genotype_upload(file, sequence, trait_info)
+
         # Get the DNA sequence from either file or direct input
         if file:
             logger.info(f"Processing uploaded file: {file.filename}")
@@ -483,6 +553,15 @@ async def analyze_dna(
         if not dna_sequence:
             raise HTTPException(status_code=400, detail="Invalid DNA sequence")
 
+        if backend:
+            try:
+                get_backend(backend)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+
+        if alignment_format not in ALIGNMENT_FORMATS:
+            raise HTTPException(status_code=400, detail=f"Invalid alignment format. Use one of: {', '.join(ALIGNMENT_FORMATS)}")
+
         # Initialize results
         results = {
             "sequenceLength": len(dna_sequence),
@@ -495,12 +574,19 @@ async def analyze_dna(
                 trait_data = json.loads(trait_info)
                 logger.info(f"Analyzing mutations for trait: {trait_data['trait']}")
                 
-                # Analyze the sequence for mutations
-                mutation_results = mutation_analyzer.analyze_sequence(dna_sequence, trait_data)
+                # Analyze the sequence for mutations (in a worker thread: long scans must not block the event loop)
+                mutation_results = await run_in_threadpool(mutation_analyzer.analyze_sequence, dna_sequence, trait_data,
+                                                           backend, report_all_variants=all_variants)
                 
                 # Extract the matches and alignment statistics
                 results["mutations"] = mutation_results.get("matches", [])
                 results["alignment_statistics"] = mutation_results.get("alignment_statistics", {})
+                if "variants" in mutation_results:
+                    results["variants"] = mutation_results["variants"]
+                if "reuse" in mutation_results:
+                    results["reuse"] = mutation_results["reuse"]
+                if alignment_format == "compact":
+                    results["alignment_statistics"] = compact_alignment_statistics(results["alignment_statistics"])
                 
                 logger.info(f"Found {len(results['mutations'])} mutations")
                 
@@ -525,7 +611,8 @@ async def analyze_dna(
                     "analysis_summary": {
                         "gc_content": results["gcContent"],
                         "mutations": results.get("mutations", []),
-                        "alignment": results.get("alignment_statistics", {})
+                        # History keeps only the compact (CIGAR) form of each alignment
+                        "alignment": compact_alignment_statistics(results.get("alignment_statistics", {}))
                     }
                 }
                 await save_analysis_history(analysis_history_data)
@@ -536,6 +623,8 @@ async def analyze_dna(
 
         return results
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in analyze_dna: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -543,11 +632,15 @@ async def analyze_dna(
 @app.post("/analyze/mutations")
 async def analyze_mutations(
     sequence: str = Form(...),
-    trait_info: str = Form(None)
+    trait_info: str = Form(None),
+    backend: str = Form(None),
+    alignment_format: str = Form("full")
 ):
     """
     Analyze a DNA sequence for known mutations and their associated traits using sequence alignment.
     If trait_info is provided, only analyze for that specific trait.
+    backend optionally selects the alignment backend (see alignment.ALIGNMENT_BACKENDS);
+    alignment_format is "full" (aligned strings) or "compact" (CIGAR edit script).
     """
     logger.info("Received mutation analysis request")
     
@@ -569,6 +662,15 @@ async def analyze_mutations(
                 detail=f"Invalid DNA sequence. Found invalid characters: {', '.join(invalid_chars)}. Sequence must contain only A, T, C, and G."
             )
 
+        if backend:
+            try:
+                get_backend(backend)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+
+        if alignment_format not in ALIGNMENT_FORMATS:
+            raise HTTPException(status_code=400, detail=f"Invalid alignment format. Use one of: {', '.join(ALIGNMENT_FORMATS)}")
+
         # Parse trait info if provided
         trait_data = None
         if trait_info:
@@ -580,8 +682,10 @@ async def analyze_mutations(
 
         # Analyze sequence for mutations with alignment
         logger.info("Starting mutation analysis with alignment")
-        analysis_result = mutation_analyzer.analyze_sequence(sequence, trait_data)
+        analysis_result = await run_in_threadpool(mutation_analyzer.analyze_sequence, sequence, trait_data, backend)
         logger.info(f"Found {len(analysis_result['matches'])} matches")
+        if alignment_format == "compact":
+            analysis_result["alignment_statistics"] = compact_alignment_statistics(analysis_result["alignment_statistics"])
         
         # Generate detailed summary with alignment information
         summary = mutation_analyzer.get_trait_summary(analysis_result)
@@ -998,6 +1102,26 @@ async def delete_all_analysis_history(current_user: dict = Depends(get_current_u
         logger.error(f"Error deleting all analysis history: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/alignment-cache")
+async def alignment_cache_stats():
+    """Hit/miss/eviction counters and size of the alignment cache"""
+    return mutation_analyzer.alignment_cache.stats()
+
+@app.get("/genotyping")
+async def genotyping_stats():
+    """How many located regions were genotyped by the exact-match fast path vs full alignment"""
+    return mutation_analyzer.fast_path_stats()
+
+@app.get("/chunk-cache")
+async def chunk_cache_stats():
+    """Size of the per-chunk seed-hit cache used to rescan only the edited parts of re-uploads"""
+    return mutation_analyzer.chunk_seeds.stats()
+
+@app.get("/upload-indexes")
+async def upload_index_stats():
+    """Size and build/hit counters of the FM-indexes kept for repeatedly analyzed uploads"""
+    return mutation_analyzer.upload_indexes.stats()
+
 @app.get("/health")
 async def health_check():
     """Simple health check endpoint"""
@@ -1,11 +1,38 @@
+import os
 import json
+import time
+import threading
 from pathlib import Path
 from typing import List, Dict, Any, Tuple
 import logging
-from alignment import needleman_wunsch
+import numpy as np
+from alignment import (planned_alignment, semi_global, ungapped_alignment, AlignmentCoordinates, call_variants,
+                       variants_to_lists)
+from region_search import find_approximate, KmerIndex, ChunkSeedCache, ungapped_matches, reverse_complement, _parallel
+from alignment_cache import AlignmentCache
+from reference_genome import ReferenceGenome
+from fm_index import FMIndex, UploadIndexes
+from snp_catalog import SnpCatalog, PositionIndex, field_values, first_rows
+from genotype_import import GenotypeIndex, GenotypeImport
 
 logger = logging.getLogger(__name__)
 
+# Match percentage below which the reference region is reported as low similarity
+MIN_REGION_MATCH = 80
+
+# Seed-index votes needed to accept a candidate region without the edit-distance search
+MIN_SEED_VOTES = 4
+
+# Optional reference genome FASTA; when set, each trait's reference is fetched from it
+# (position_start-position_end of its chromosome) with REFERENCE_FLANK bases on each side
+# instead of using the short reference_sequence embedded in the SNP database
+REFERENCE_FASTA = os.getenv("REFERENCE_FASTA")
+REFERENCE_FLANK = int(os.getenv("REFERENCE_FLANK", "100"))
+
+# Compiled SNP catalog (see snp_catalog.py), memory-mapped instead of parsing
+# data/snps_db.json when it exists and is not older than the JSON
+SNP_CATALOG = os.getenv("SNP_CATALOG", str(Path(__file__).parent / "data" / "snps_db.bin"))
+
 def get_aligned_index(aligned_seq: str, relative_index: int) -> int:
     """
     Convert a relative (non-gap) position to an aligned position.
@@ -16,28 +43,228 @@ def get_aligned_index(aligned_seq: str, relative_index: int) -> int:
         
     Returns:
         The corresponding position in the aligned sequence, or -1 if not found
+
+    To map many positions of the same alignment, build one AlignmentCoordinates
+    and use its batch lookups instead of calling this per position.
+    """
+    aligned_index = AlignmentCoordinates(aligned_seq, aligned_seq).query_to_aligned(relative_index)
+    if aligned_index == -1:
+        logger.warning(f"Could not find aligned index for relative index {relative_index}")
+    else:
+        logger.info(f"Found aligned index {aligned_index} for relative index {relative_index}")
+    return aligned_index
+
+def _oriented(window: str, strand: str) -> str:
+    """The window as read along the reference: reverse complemented on the minus strand."""
+    return reverse_complement(window) if strand == '-' else window
+
+def _to_forward_strand(variants: Dict[str, np.ndarray], window_end: int) -> None:
+    """
+    Map absolute positions of variants called on a reverse-complemented window
+    (offsets within that window) back to the forward upload, in place. Each
+    position becomes the first forward base of the variant (for deletions, the
+    forward base after the gap).
     """
-    non_gap_count = 0
-    for i, base in enumerate(aligned_seq):
-        if base != '-':
-            if non_gap_count == relative_index:
-                logger.info(f"Found aligned index {i} for relative index {relative_index}")
-                return i
-            non_gap_count += 1
-    logger.warning(f"Could not find aligned index for relative index {relative_index}")
-    return -1  # not found
+    query_length = np.where(variants['type'] == 'D', 0, variants['length'])
+    variants['absolute_position'] = window_end - variants['absolute_position'] - query_length
 
 class MutationAnalyzer:
-    def __init__(self):
+    def __init__(self, reference_fasta: str = None):
         try:
             self.snps_db = self._load_snps_db()
+            self.trait_rows, self.reference_rows, self.snp_positions = self._build_snp_indexes()
+            self._genotype_index = None  # built on the first genotype-file upload
+            reference_fasta = reference_fasta or REFERENCE_FASTA
+            self.genome = ReferenceGenome(reference_fasta) if reference_fasta else None
+            self.references = self._load_references()
+            self.alleles = {}  # per SNP row, built by _alleles on first use
+            self.seed_index = self._build_seed_index()
+            self.alignment_cache = AlignmentCache()
+            self.upload_indexes = UploadIndexes()
+            self.chunk_seeds = ChunkSeedCache()
+            # How located regions were genotyped: verbatim allele (no DP) or by alignment
+            self.genotyping = {"exact_reference": 0, "exact_variant": 0, "aligned": 0}
+            self._genotyping_lock = threading.Lock()  # analyses run in worker threads
             logger.info("Successfully loaded SNPs database")
         except Exception as e:
             logger.error(f"Error during initialization: {str(e)}")
             raise
 
+    def reload_snps_db(self) -> None:
+        """
+        Reload the SNPs database, rebuild the seed index and drop cached alignments
+        against reference sequences that changed or were removed.
+        """
+        old_references = {sequence for sequence, _ in self.references.values()}
+        self.snps_db = self._load_snps_db()
+        self.trait_rows, self.reference_rows, self.snp_positions = self._build_snp_indexes()
+        self._genotype_index = None
+        self.references = self._load_references()
+        self.alleles = {}
+        self.seed_index = self._build_seed_index()
+        new_references = {sequence for sequence, _ in self.references.values()}
+        removed = sum(self.alignment_cache.invalidate(reference) for reference in old_references - new_references)
+        logger.info(f"Reloaded SNPs database, invalidated {removed} cached alignments")
+
+    def _build_snp_indexes(self) -> Tuple[Dict[Tuple[str, str], int], List[int], PositionIndex]:
+        """
+        Row of the first SNP of every (trait, gene); for every SNP, the row of the
+        first SNP with the same reference region (chromosome, span and embedded
+        sequence), which keys its reference; and the (chromosome, position) index
+        of all SNPs used to annotate the known variants of aligned regions.
+        """
+        snps = self.snps_db["snps"]
+        rows = np.unique(first_rows(snps, ("trait", "gene"))).tolist()
+        trait_rows = dict(zip(zip(field_values(snps, "trait", rows), field_values(snps, "gene", rows)), rows))
+        reference_rows = first_rows(snps, ("chromosome", "position_start", "position_end", "reference_sequence")).tolist()
+        snp_positions = PositionIndex(snps)
+        logger.info(f"Indexed {len(snp_positions)} SNP positions for {len(trait_rows)} traits in {len(set(reference_rows))} reference regions")
+        return trait_rows, reference_rows, snp_positions
+
+    def genotype_import(self, trait_info: Dict[str, Any] = None) -> GenotypeImport:
+        """
+        Start joining a raw genotype file (rsid, chromosome, position, genotype)
+        against the SNP database, without any alignment.
+
+        Args:
+            trait_info: Optional trait to restrict the matches to
+
+        Returns:
+            A GenotypeImport to feed() the file to chunk by chunk; its finish()
+            result has the matches structure of analyze_sequence for get_trait_summary
+        """
+        if self._genotype_index is None:
+            self._genotype_index = GenotypeIndex(self.snps_db["snps"])
+        return GenotypeImport(self._genotype_index, trait_info)
+
+    def _load_references(self) -> Dict[int, Tuple[str, int]]:
+        """
+        Reference sequence of every reference region and the genomic position of
+        its first base, by reference row (see _build_snp_indexes). Taken from the
+        reference genome when one is configured and has the SNP's chromosome,
+        otherwise from the SNP database entry.
+        """
+        snps = self.snps_db["snps"]
+        rows = sorted(set(self.reference_rows))
+        fields = ("reference_sequence", "chromosome", "position_start", "position_end", "gene")
+        values = (field_values(snps, field, rows) for field in fields)
+        references = {}
+        for row, sequence, chromosome, position_start, position_end, gene in zip(rows, *values):
+            sequence, genomic_start = sequence.upper(), position_start if position_start is not None else 0
+            resolved = self.genome.resolve(chromosome or "") if self.genome else None
+            if resolved:
+                start = max(1, position_start - REFERENCE_FLANK)
+                fetched = self.genome.fetch(resolved, start, position_end + REFERENCE_FLANK).upper()
+                if fetched:
+                    sequence, genomic_start = fetched, start
+            elif self.genome:
+                logger.warning(f"Chromosome {chromosome} of {gene} not in the reference genome, using the embedded sequence")
+            references[row] = (sequence, genomic_start)
+        return references
+
+    def _alleles(self, row: int) -> Dict[str, Dict[str, str]]:
+        """
+        Per strand, the reference sequence of a SNP row and its variant-substituted
+        version as they would appear verbatim in an upload, mapped to the allele
+        name. The variant version is only built when the SNP position falls on
+        its reference base within the reference sequence. Built on first use.
+        """
+        alleles = self.alleles.get(row)
+        if alleles is None:
+            snp = self.snps_db["snps"][row]
+            ref_seq, genomic_start = self.references[self.reference_rows[row]]
+            versions = {ref_seq: "reference"}
+            site = snp["position"] - genomic_start
+            if 0 <= site < len(ref_seq) and ref_seq[site] == snp["reference"] and len(snp["variant"]) == 1:
+                versions[ref_seq[:site] + snp["variant"] + ref_seq[site + 1:]] = "variant"
+            alleles = self.alleles[row] = {
+                "+": versions,
+                "-": {reverse_complement(version): allele for version, allele in versions.items()}
+            }
+        return alleles
+
+    def _exact_region(self, window: str, seeded_offset: int, strand: str, row: int):
+        """
+        Find a verbatim allele of the reference of a SNP row in a (forward) window.
+        Tries the seeded offset first, then anywhere in the window, as seed
+        placements can be off by a few bases.
+
+        Returns:
+            (offset in the window, allele name), or None if no allele occurs verbatim
+        """
+        alleles = self._alleles(row)[strand]
+        length = len(next(iter(alleles)))
+        allele = alleles.get(window[seeded_offset:seeded_offset + length])
+        if allele:
+            return seeded_offset, allele
+        for version, allele in alleles.items():
+            offset = window.find(version)
+            if offset != -1:
+                return offset, allele
+        return None
+
+    def _seed_candidates(self, sequence: str, text_index: FMIndex = None) -> Tuple[Dict[int, List[Dict[str, int]]], Dict[str, Any]]:
+        """
+        Seed-index candidates of every reference region in `sequence` (best only), by reference row.
+
+        Without an FM-index (and below the parallel-scan length) the sequence is
+        scanned chunk by chunk through self.chunk_seeds, so a re-upload with a few
+        edits only rescans the content-defined chunks around them.
+
+        Returns:
+            The candidates and a report of how the seed hits were obtained
+        """
+        if text_index is not None:
+            candidates = self.seed_index.candidates(sequence, limit=1, text_index=text_index)
+            return candidates, {"source": "fm-index"}
+        if _parallel(sequence, None):
+            return self.seed_index.candidates(sequence, limit=1), {"source": "parallel-scan"}
+        candidates, report = self.chunk_seeds.candidates(self.seed_index, sequence, limit=1)
+        logger.info(f"Seed scan reused {report['reused_chunks']} of {report['chunks']} chunks ({report['reused_bases']} bases)")
+        return candidates, {"source": "chunks", **report}
+
+    @staticmethod
+    def _reuse_report(seeds: Dict[str, Any], alignment_stats: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """What an analysis reused: seed hits per chunk and cached region alignments."""
+        plans = [stats["plan"] for stats in alignment_stats.values() if "plan" in stats]
+        return {
+            "seeds": seeds,
+            "alignments": {
+                "reused": sum(plan.get("cache") == "hit" for plan in plans),
+                "computed": sum(plan.get("cache") == "miss" for plan in plans),
+                "exact": sum(plan["mode"] == "exact" for plan in plans)
+            }
+        }
+
+    def fast_path_stats(self) -> Dict[str, Any]:
+        """Genotyping counters and the share of located regions resolved without alignment."""
+        with self._genotyping_lock:
+            counters = dict(self.genotyping)
+        exact = counters["exact_reference"] + counters["exact_variant"]
+        total = exact + counters["aligned"]
+        return {**counters, "hit_rate": exact / total if total else 0.0}
+
+    def _build_seed_index(self) -> KmerIndex:
+        """
+        Index every k-mer of every reference region, and of its reverse
+        complement, by reference row.
+        """
+        seed_index = KmerIndex({row: sequence for row, (sequence, _) in self.references.items()},
+                               both_strands=True)
+        logger.info(f"Built seed index over {len(seed_index.names)} reference sequences")
+        return seed_index
+
     def _load_snps_db(self) -> Dict[str, Any]:
         db_path = Path(__file__).parent / "data" / "snps_db.json"
+        catalog_path = Path(SNP_CATALOG)
+        if catalog_path.exists():
+            if db_path.exists() and db_path.stat().st_mtime > catalog_path.stat().st_mtime:
+                logger.warning(f"SNP catalog {catalog_path} is older than {db_path}, loading the JSON (rebuild it with snp_catalog.py)")
+            else:
+                # Text fields stay in the mapped file until a match needs them
+                catalog = SnpCatalog(catalog_path)
+                logger.info(f"Mapped SNP catalog {catalog_path} ({len(catalog)} SNPs, {catalog.nbytes} bytes)")
+                return {"snps": catalog, "metadata": catalog.metadata}
         logger.info(f"Attempting to load SNPs database from: {db_path}")
         try:
             with open(db_path, 'r') as f:
@@ -54,14 +281,36 @@ class MutationAnalyzer:
             logger.error(f"Unexpected error loading SNPs database: {str(e)}")
             raise
 
-    def _align_sequence(self, query: str, reference: str) -> Tuple[str, str, Dict]:
+    def _align_sequence(self, query: str, reference: str, backend: str = None) -> Tuple[str, str, Dict]:
         """
-        Align query sequence with reference sequence using Needleman-Wunsch algorithm.
-        Returns aligned query, aligned reference, and alignment statistics.
+        Align the reference to the part of the query window it occupies.
+        The reference is first placed in the window with free end gaps on the query (semi-global),
+        so flanking bases are not charged as gaps; the placed span is then aligned end to end by the
+        alignment planner, which picks the engine (full DP through the backend registry, banded, or
+        linear-memory) from the problem size and memory limit. Results are memoized in self.alignment_cache.
+        Returns aligned query, aligned reference, and alignment statistics (with the plan, and the
+        placed span as query_start/query_end in the window); match_percentage covers the reference span only.
         """
         try:
             logger.info(f"Aligning sequences:\nQuery ({len(query)} bp): {query}\nReference ({len(reference)} bp): {reference}")
-            alignment_result = needleman_wunsch(query, reference)
+            cache_key = AlignmentCache.make_key(query, reference, backend=backend)
+            alignment_result = self.alignment_cache.get(cache_key)
+            if alignment_result is not None:
+                alignment_result['plan']['cache'] = 'hit'
+            else:
+                placed = semi_global(query, reference)
+                query_start, query_end = placed['query_start'], placed['query_end']
+                if query_start >= query_end:
+                    # Nothing of the reference lines up with the window: align all of it
+                    query_start, query_end = 0, len(query)
+                alignment_result = planned_alignment(query[query_start:query_end], reference, backend=backend, offset=0)
+                alignment_result['query_start'] = query_start
+                alignment_result['query_end'] = query_end
+                self.alignment_cache.put(cache_key, reference, alignment_result)
+                alignment_result['plan']['cache'] = 'miss'
+            plan = alignment_result['plan']
+            logger.info(f"Alignment cache {plan['cache']}: {self.alignment_cache.stats()}")
+            logger.info(f"Alignment plan: {plan['mode']} ({plan['backend']}), estimated {plan['estimated_seconds']:.4f}s / {plan['estimated_bytes']} bytes, took {plan['actual_seconds']:.4f}s")
             logger.info(f"Alignment result:\nAligned Query: {alignment_result['aligned_seq1']}\nAligned Ref:   {alignment_result['aligned_seq2']}")
             return (
                 alignment_result['aligned_seq1'],  # query
@@ -72,7 +321,8 @@ class MutationAnalyzer:
             logger.error(f"Sequence alignment failed: {str(e)}")
             raise
 
-    def _find_mutations(self, aligned_query: str, aligned_ref: str, snp_info: Dict[str, Any], window_start: int = 0) -> List[Dict[str, Any]]:
+    def _find_mutations(self, aligned_query: str, aligned_ref: str, snp_info: Dict[str, Any], window_start: int = 0,
+                        variants: Dict[str, np.ndarray] = None) -> List[Dict[str, Any]]:
         """
         Find mutations by comparing aligned sequences and checking against known SNPs.
         Args:
@@ -80,141 +330,352 @@ class MutationAnalyzer:
             aligned_ref: Aligned reference sequence
             snp_info: SNP information (contains position, gene, reference, variant)
             window_start: Start index of the window in the user's full sequence
+            variants: Optional alignment.call_variants output for this alignment
+                (computed here if not given)
         Returns:
             List with mutation dict if mismatch is found at SNP site, else empty list.
         """
-        mutations = []
         logger.info(f"Looking for mutation: {snp_info['reference']} -> {snp_info['variant']}")
-        logger.info(f"Aligned query: {aligned_query}")
-        logger.info(f"Aligned ref:   {aligned_ref}")
-        # Check all positions for mutations
-        query_index = 0
-        for i, (ref_base, query_base) in enumerate(zip(aligned_ref, aligned_query)):
-            if ref_base != '-':
-                if query_base != '-':
-                    # Only increment query_index if not a gap
-                    if ref_base != query_base:
-                        logger.info(f"Found mutation at position {i}: {ref_base} -> {query_base}")
-                        if ref_base == snp_info["reference"] and query_base == snp_info["variant"]:
-                            logger.info(f"Mutation matches expected SNP!")
-                            start_ctx = max(0, i - 5)
-                            end_ctx = min(len(aligned_ref), i + 6)
-                            context = aligned_ref[start_ctx:end_ctx]
-                            mutation = {
-                                "aligned_position": i,
-                                "reference_base": ref_base,
-                                "query_base": query_base,
-                                "context": context,
-                                "relative_position": i,
-                                "absolute_position": window_start + query_index
-                            }
-                            logger.info(f"Mutation found: {mutation}")
-                            mutations.append(mutation)
-                            break  # Found the expected mutation, no need to continue
-                    query_index += 1
-        if not mutations:
+        if variants is None:
+            variants = call_variants(aligned_query, aligned_ref, query_offset=window_start,
+                                     genomic_start=snp_info.get("position_start", 0))
+        logger.info(f"Alignment has {len(variants['type'])} differences")
+        # Only substitutions matching the expected SNP need annotating; take the first
+        expected = np.flatnonzero((variants['type'] == 'X') &
+                                  (variants['reference_bases'] == snp_info["reference"]) &
+                                  (variants['query_bases'] == snp_info["variant"]))
+        if len(expected) == 0:
             logger.info("No matching mutations found")
-        return mutations
+            return []
 
-    def analyze_sequence(self, sequence: str, trait_info: Dict[str, Any] = None) -> Dict[str, Any]:
+        mutation = self._variant_mutation(variants, expected[0], aligned_ref)
+        logger.info(f"Mutation matches expected SNP: {mutation}")
+        return [mutation]
+
+    @staticmethod
+    def _variant_mutation(variants: Dict[str, np.ndarray], row: int, aligned_ref: str) -> Dict[str, Any]:
+        """Mutation dict (as returned by _find_mutations) of one substitution row of call_variants output."""
+        i = int(variants['aligned_position'][row])
+        start_ctx = max(0, i - 5)
+        end_ctx = min(len(aligned_ref), i + 6)
+        return {
+            "aligned_position": i,
+            "reference_base": str(variants['reference_bases'][row]),
+            "query_base": str(variants['query_bases'][row]),
+            "context": aligned_ref[start_ctx:end_ctx],
+            "relative_position": i,
+            "absolute_position": int(variants['absolute_position'][row]),
+            "genomic_position": int(variants['genomic_position'][row])
+        }
+
+    def _catalog_matches(self, variants: Dict[str, np.ndarray], aligned_ref: str, own_row: int,
+                         genomic_start: int, length: int) -> List[Dict[str, Any]]:
+        """
+        Annotate the other catalog SNPs inside an aligned region.
+
+        One position-index query returns every SNP of the region's genomic span
+        (genomic_start .. genomic_start + length - 1 on the trait's chromosome);
+        each one whose substitution is among the region's variants becomes a match.
+
+        Returns:
+            Matches in the structure of _match_mutation_to_snp, by position
+        """
+        snp_entry = self.snps_db["snps"][own_row]
+        if "chromosome" not in snp_entry or not len(variants['type']):
+            return []
+        rows = self.snp_positions.overlapping(snp_entry["chromosome"], genomic_start, genomic_start + length - 1)
+        substitutions = variants['type'] == 'X'
+        matches = []
+        for row in rows.tolist():
+            if row == own_row:
+                continue
+            snp = self.snps_db["snps"][row]
+            found = np.flatnonzero(substitutions & (variants['genomic_position'] == snp["position"]) &
+                                   (variants['reference_bases'] == snp["reference"]) &
+                                   (variants['query_bases'] == snp["variant"]))
+            if len(found):
+                mutation = self._variant_mutation(variants, found[0], aligned_ref)
+                matches.append(self._match_mutation_to_snp(mutation, snp["gene"], snp["position"], trait_info=snp))
+        if matches:
+            logger.info(f"Annotated {len(matches)} other known variants in the {snp_entry['gene']} region")
+        return matches
+
+    def analyze_sequence(self, sequence: str, trait_info: Dict[str, Any] = None, backend: str = None,
+                         report_all_variants: bool = False) -> Dict[str, Any]:
         """
         Analyze a DNA sequence for known mutations using sequence alignment.
         
         Args:
             sequence: The DNA sequence to analyze
-            trait_info: Optional trait information for specific analysis
+            trait_info: Optional trait information for specific analysis; without it
+                every trait in the SNP database is analyzed (panel mode)
+            backend: Optional alignment backend name (see alignment.ALIGNMENT_BACKENDS)
+            report_all_variants: Also return every substitution/insertion/deletion in the
+                aligned region under "variants" (columnar, see alignment.call_variants)
             
         Returns:
-            Dictionary containing matches and alignment statistics
+            Dictionary containing matches, alignment statistics and a "reuse" report of
+            the seed hits and alignments taken from earlier analyses
         """
         logger.info(f"Starting analysis of sequence (length: {len(sequence)})")
         logger.info(f"Trait info: {trait_info}")
         sequence = sequence.upper()  # Normalize to uppercase
-        matches = []
-        alignment_stats = {}
-        warning = None
 
         try:
-            if trait_info:
-                # Find the SNP entry for this trait
-                snp_entry = None
-                for snp in self.snps_db["snps"]:
-                    if snp["trait"] == trait_info["trait"] and snp["gene"] == trait_info["gene"]:
-                        snp_entry = snp
-                        break
-                if not snp_entry:
-                    logger.error(f"No SNP entry found for trait {trait_info['trait']}")
-                    return {
-                        "matches": [],
-                        "alignment_statistics": {},
-                        "warning": f"No SNP entry found for trait {trait_info['trait']}"
-                    }
-                logger.info(f"Found SNP entry: {snp_entry}")
-
-                # Efficient region search for long sequences
-                ref_seq = snp_entry["reference_sequence"].upper()
-                idx = sequence.find(ref_seq[:20])  # Use first 20 bases as anchor
-                if idx == -1:
-                    # Try to find the best matching window in the user's sequence
-                    best_match = 0
-                    best_start = 0
-                    window_len = len(ref_seq)
-                    for i in range(0, len(sequence) - window_len + 1, max(1, window_len // 10)):
-                        window = sequence[i:i+window_len]
-                        matches = sum(1 for a, b in zip(window, ref_seq) if a == b)
-                        match_pct = (matches / window_len) * 100
-                        if match_pct > best_match:
-                            best_match = match_pct
-                            best_start = i
-                    
-                    # Create alignment statistics for the best match found
-                    best_window = sequence[best_start:best_start+window_len]
-                    aligned_query, aligned_ref, align_stats = self._align_sequence(best_window, ref_seq)
-                    alignment_stats[snp_entry["gene"]] = align_stats
-                    
-                    warning = f"Reference region for this trait was not detected in your sequence. Best match percentage found: {best_match:.1f}%. This may indicate your sequence is from a different region or contains significant variations."
-                    logger.warning(warning)
-                    return {
-                        "matches": [],
-                        "alignment_statistics": alignment_stats,
-                        "warning": warning
-                    }
-                # Extract window ±100 bases around the match
-                start = max(0, idx - 100)
-                end = min(len(sequence), idx + len(ref_seq) + 100)
-                window_seq = sequence[start:end]
-                logger.info(f"Extracted window for alignment: {start}-{end} (length {len(window_seq)})")
-
-                # Align only the window to the reference
-                aligned_query, aligned_ref, align_stats = self._align_sequence(window_seq, ref_seq)
-                alignment_stats[snp_entry["gene"]] = align_stats
-
-                match_percentage = align_stats.get('match_percentage', 0)
-                # Always return alignment statistics, even if match percentage is low
-                # This allows the frontend to show meaningful match percentages
-                if match_percentage < 80:
-                    warning = f"Input sequence has low similarity to the reference region for this trait. Match percentage: {match_percentage:.1f}%. This may indicate the sequence is from a different region or contains significant variations."
-                    logger.warning(warning)
-                
-                # Continue with mutation analysis even if match percentage is low
-                # This allows us to show the match percentage and any mutations that might be found
-
-                mutations = self._find_mutations(aligned_query, aligned_ref, snp_entry, window_start=start)
-                logger.info(f"Found {len(mutations)} mutations for gene {snp_entry['gene']}")
-                # Map each mutation to the full output structure
-                matches = [self._match_mutation_to_snp(m, snp_entry["gene"], snp_entry["position"], trait_info=snp_entry) for m in mutations]
-
-                logger.info(f"Analysis complete. Found {len(matches)} matches.")
+            # Repeated analyses of one upload look seeds up in its FM-index instead of rescanning it
+            text_index = self.upload_indexes.get(sequence)
+            if not trait_info:
+                return self._analyze_panel(sequence, backend, report_all_variants, text_index)
+
+            # Find the SNP entry for this trait
+            row = self.trait_rows.get((trait_info["trait"], trait_info["gene"]))
+            snp_entry = self.snps_db["snps"][row] if row is not None else None
+            if not snp_entry:
+                logger.error(f"No SNP entry found for trait {trait_info['trait']}")
                 return {
-                    "matches": matches,
-                    "alignment_statistics": alignment_stats,
-                    **({"warning": warning} if warning else {})
+                    "matches": [],
+                    "alignment_statistics": {},
+                    "warning": f"No SNP entry found for trait {trait_info['trait']}"
                 }
+            logger.info(f"Found SNP entry: {snp_entry}")
+
+            # One pass of the seed index votes for where the reference starts; mutations
+            # anywhere in the region only remove a few of its seeds
+            candidates, seed_reuse = self._seed_candidates(sequence, text_index)
+            seeds = candidates.get(self.reference_rows[row], [])
+            region = self._analyze_region(sequence, row, seeds, backend, report_all_variants)
+            if "warning" in region:
+                logger.warning(f"{snp_entry['gene']}: {region['warning']}")
+            logger.info(f"Analysis complete. Found {len(region['matches'])} matches.")
+            alignment_stats = {snp_entry["gene"]: region["alignment"]} if region["alignment"] else {}
+            return {
+                "matches": region["matches"],
+                "alignment_statistics": alignment_stats,
+                "reuse": self._reuse_report(seed_reuse, alignment_stats),
+                **({"variants": {snp_entry["gene"]: region["variants"]}} if "variants" in region else {}),
+                **({"warning": region["warning"]} if "warning" in region else {})
+            }
 
         except Exception as e:
             logger.error(f"Error during sequence analysis: {str(e)}")
             raise
 
+    def _analyze_panel(self, sequence: str, backend: str = None, report_all_variants: bool = False,
+                       text_index: FMIndex = None) -> Dict[str, Any]:
+        """
+        Analyze every trait in the SNP database against one sequence.
+
+        A single seed-index scan locates all reference regions at once; each located
+        region is then aligned and called on its own small window. Traits without a
+        confident placement are reported as not detected instead of rescanning the
+        sequence for each of them.
+
+        Args:
+            sequence: The (uppercase) DNA sequence to analyze
+            backend: Optional alignment backend name
+            report_all_variants: Also return every variant of each aligned region
+            text_index: Optional FM-index of the sequence to look seeds up in
+
+        Returns:
+            Dictionary with the combined matches and alignment statistics (keyed by gene),
+            per-trait results under "traits", a "reuse" report and, if requested, "variants" by gene
+        """
+        candidates, seed_reuse = self._seed_candidates(sequence, text_index)
+        logger.info(f"Panel scan placed {len(candidates)} of {len(self.seed_index.names)} reference regions")
+
+        matches = []
+        alignment_stats = {}
+        variants = {}
+        traits = {}
+        known = set()  # (rsid, position) of known variants already reported by an overlapping region
+        undetected, low_similarity = [], []  # rsids, summarized once instead of a warning per SNP
+        for row, snp_entry in enumerate(self.snps_db["snps"]):
+            region = self._analyze_region(sequence, row, candidates.get(self.reference_rows[row], []),
+                                          backend, report_all_variants, search_unseeded=False)
+            if not region["detected"]:
+                undetected.append(snp_entry.get("rsid", "unknown"))
+            elif "warning" in region:
+                low_similarity.append(snp_entry.get("rsid", "unknown"))
+            for match in region["matches"]:
+                if match["rsid"] != "unknown":
+                    if (match["rsid"], match["position"]) in known:
+                        continue
+                    known.add((match["rsid"], match["position"]))
+                matches.append(match)
+            if region["alignment"]:
+                alignment_stats[snp_entry["gene"]] = region["alignment"]
+            if "variants" in region:
+                variants[snp_entry["gene"]] = region["variants"]
+            if traits.get(snp_entry["trait"], {}).get("detected"):
+                continue  # keep the first detected region of a trait with several SNPs
+            traits[snp_entry["trait"]] = {
+                "gene": snp_entry["gene"],
+                "detected": region["detected"],
+                "strand": region["strand"],
+                "matches": len(region["matches"]),
+                **({"warning": region["warning"]} if "warning" in region else {})
+            }
+
+        for rsids, outcome in ((undetected, "not detected"), (low_similarity, "detected with low similarity")):
+            if rsids:
+                logger.warning(f"Panel: {len(rsids)} of {len(self.snps_db['snps'])} SNP regions {outcome} "
+                               f"(e.g. {', '.join(rsids[:5])})")
+        logger.info(f"Panel analysis complete. Found {len(matches)} matches across {len(traits)} traits.")
+        return {
+            "matches": matches,
+            "alignment_statistics": alignment_stats,
+            "traits": traits,
+            "reuse": self._reuse_report(seed_reuse, alignment_stats),
+            **({"variants": variants} if report_all_variants else {})
+        }
+
+    def _analyze_region(self, sequence: str, row: int, seeds: List[Dict[str, int]],
+                        backend: str = None, report_all_variants: bool = False,
+                        search_unseeded: bool = True) -> Dict[str, Any]:
+        """
+        Locate one trait's reference region in a sequence, align it and call its mutations.
+
+        The region may lie on either strand. Minus-strand regions are reverse
+        complemented before alignment, so mutations are always reported in
+        forward-strand reference bases and coordinates, with their strand noted.
+
+        Args:
+            sequence: The (uppercase) DNA sequence to analyze
+            row: SNP database row of the trait
+            seeds: Seed-index candidates for the trait's reference, best first
+            backend: Optional alignment backend name
+            report_all_variants: Also return every variant of the aligned region
+            search_unseeded: Without a confident seed placement, search the whole
+                sequence for the closest occurrence; otherwise align the best seed
+                candidate (if any) only to report its match percentage
+
+        Returns:
+            Dictionary with "matches", "alignment" (statistics, empty if nothing was
+            aligned), "detected", "strand" and optionally "warning" and "variants"
+        """
+        snp_entry = self.snps_db["snps"][row]
+        ref_seq, genomic_start = self.references[self.reference_rows[row]]
+        patterns = {'+': ref_seq, '-': reverse_complement(ref_seq)}
+        idx = -1
+        strand = '+'
+        if seeds and seeds[0]["votes"] >= MIN_SEED_VOTES:
+            idx = max(0, seeds[0]["start"])
+            strand = seeds[0]["strand"]
+            logger.info(f"Seed index placed the {snp_entry['gene']} reference at {idx} on the {strand} strand ({seeds[0]['votes']} votes)")
+        if idx == -1:
+            if search_unseeded:
+                # Too few seeds (a highly diverged region, or none): find the closest
+                # occurrence within the edit budget on either strand, then place the
+                # whole reference there with free end gaps, indels included
+                max_edits = len(ref_seq) * (100 - MIN_REGION_MATCH) // 100
+                closest = None
+                for pattern_strand, pattern in patterns.items():
+                    ends, distances = find_approximate(sequence, pattern, max_edits)
+                    if len(ends) and (closest is None or distances.min() < closest[0]):
+                        closest = (int(distances.min()), pattern_strand, int(ends[distances.argmin()]))
+                if closest:
+                    _, strand, best_end = closest
+                    region_start = max(0, best_end - len(ref_seq) - max_edits)
+                    hit = semi_global(sequence[region_start:best_end], patterns[strand])
+                    hit['query_start'] += region_start
+                    hit['query_end'] += region_start
+                else:
+                    # Nothing within the edit budget: report the best ungapped window,
+                    # exact at every offset
+                    counts = {pattern_strand: ungapped_matches(sequence, pattern)
+                              for pattern_strand, pattern in patterns.items()}
+                    if len(counts['+']):
+                        strand = max(counts, key=lambda pattern_strand: counts[pattern_strand].max())
+                        best_start = int(counts[strand].argmax())
+                        hit = {'query_start': best_start, 'query_end': best_start + len(ref_seq),
+                               'score': int(counts[strand][best_start]),
+                               'match_percentage': counts[strand][best_start] / len(ref_seq) * 100}
+                    else:
+                        # Sequence shorter than the reference
+                        hit = semi_global(sequence, ref_seq)
+            elif seeds:
+                # Weakly seeded: place the reference around its best candidate only
+                strand = seeds[0]["strand"]
+                region_start = max(0, seeds[0]["start"] - len(ref_seq))
+                hit = semi_global(sequence[region_start:max(0, seeds[0]["start"]) + 2 * len(ref_seq)], patterns[strand])
+                hit['query_start'] += region_start
+                hit['query_end'] += region_start
+            else:
+                warning = "Reference region for this trait was not detected in your sequence."
+                logger.debug(f"{snp_entry['gene']}: {warning}")
+                return {"matches": [], "alignment": {}, "detected": False, "strand": strand, "warning": warning}
+            best_match = hit['match_percentage']
+            logger.info(f"Best placement at {hit['query_start']}-{hit['query_end']} on the {strand} strand (score {hit['score']}, {best_match:.1f}% match)")
+            if best_match >= MIN_REGION_MATCH:
+                idx = hit['query_start']
+            else:
+                # Create alignment statistics for the best match found
+                best_window = _oriented(sequence[hit['query_start']:hit['query_end']], strand)
+                aligned_query, aligned_ref, align_stats = self._align_sequence(best_window, ref_seq, backend)
+                align_stats["strand"] = strand
+                warning = f"Reference region for this trait was not detected in your sequence. Best match percentage found: {best_match:.1f}%. This may indicate your sequence is from a different region or contains significant variations."
+                logger.debug(f"{snp_entry['gene']}: {warning}")
+                return {"matches": [], "alignment": align_stats, "detected": False, "strand": strand, "warning": warning}
+
+        # Extract window ±100 bases around the match
+        start = max(0, idx - 100)
+        end = min(len(sequence), idx + len(ref_seq) + 100)
+        exact = self._exact_region(sequence[start:end], idx - start, strand, row)
+        if exact:
+            # The reference or variant allele occurs verbatim: its gapless alignment is exact
+            began = time.perf_counter()
+            start += exact[0]
+            end = start + len(ref_seq)
+            window_seq = _oriented(sequence[start:end], strand)
+            align_stats = ungapped_alignment(window_seq, ref_seq)
+            align_stats["plan"] = {"mode": "exact", "backend": None, "cells": 0, "estimated_bytes": 0,
+                                   "estimated_seconds": 0.0, "actual_seconds": time.perf_counter() - began}
+            align_stats["query_start"], align_stats["query_end"] = 0, len(ref_seq)
+            aligned_query, aligned_ref = window_seq, ref_seq
+            with self._genotyping_lock:
+                self.genotyping[f"exact_{exact[1]}"] += 1
+            logger.info(f"Exact {exact[1]} allele at {start}-{end} ({strand} strand), alignment skipped")
+        else:
+            window_seq = _oriented(sequence[start:end], strand)
+            logger.info(f"Extracted window for alignment: {start}-{end} (length {len(window_seq)}, {strand} strand)")
+
+            # Place the reference in the window and align the span it covers
+            aligned_query, aligned_ref, align_stats = self._align_sequence(window_seq, ref_seq, backend)
+            with self._genotyping_lock:
+                self.genotyping["aligned"] += 1
+        align_stats["strand"] = strand
+        region = {"alignment": align_stats, "detected": True, "strand": strand}
+
+        match_percentage = align_stats.get('match_percentage', 0)
+        # Always return alignment statistics, even if match percentage is low
+        # This allows the frontend to show meaningful match percentages
+        if match_percentage < MIN_REGION_MATCH:
+            region["warning"] = f"Input sequence has low similarity to the reference region for this trait. Match percentage: {match_percentage:.1f}%. This may indicate the sequence is from a different region or contains significant variations."
+            logger.debug(f"{snp_entry['gene']}: {region['warning']}")
+
+        # Continue with mutation analysis even if match percentage is low
+        # This allows us to show the match percentage and any mutations that might be found
+
+        # query_start is the placed span's offset in the (oriented) window
+        placed_start = align_stats["query_start"]
+        variants = call_variants(aligned_query, aligned_ref,
+                                 query_offset=(start if strand == '+' else 0) + placed_start,
+                                 genomic_start=genomic_start)
+        if strand == '-':
+            _to_forward_strand(variants, end)
+        mutations = self._find_mutations(aligned_query, aligned_ref, snp_entry, window_start=start + placed_start,
+                                         variants=variants)
+        logger.info(f"Found {len(mutations)} mutations for gene {snp_entry['gene']}")
+        # Map each mutation to the full output structure
+        region["matches"] = [self._match_mutation_to_snp(m, snp_entry["gene"], snp_entry["position"], trait_info=snp_entry) for m in mutations]
+        region["matches"] += self._catalog_matches(variants, aligned_ref, row, genomic_start, len(ref_seq))
+        for match in region["matches"]:
+            match["strand"] = strand
+        if report_all_variants:
+            # The same alignment the matches come from, so both always agree
+            region["variants"] = variants_to_lists(variants)
+        return region
+
     def get_trait_summary(self, analysis_result: Dict[str, Any]) -> Dict[str, Any]:
         """
         Generate a summary of the traits found in the sequence.
@@ -255,7 +716,10 @@ class MutationAnalyzer:
                 "variants_found": variant_count,
                 "known_variants": known_variant_count,
                 "gene_summaries": gene_summaries,
-                "matches": matches
+                "matches": matches,
+                **({"traits": analysis_result["traits"]} if "traits" in analysis_result else {}),
+                **({"reuse": analysis_result["reuse"]} if "reuse" in analysis_result else {}),
+                **({"ingestion": analysis_result["ingestion"]} if "ingestion" in analysis_result else {})
             }
         except Exception as e:
             logger.error(f"Error generating trait summary: {str(e)}")
@@ -269,7 +733,7 @@ class MutationAnalyzer:
         if trait_info:
             # For specific trait analysis, check if mutation matches the trait's known mutation
             if (trait_info["gene"] == gene and 
-                trait_info["position_start"] <= original_pos <= trait_info["position_end"] and 
+                trait_info.get("position_start", original_pos) <= original_pos <= trait_info.get("position_end", original_pos) and 
                 trait_info["reference"] == mutation["reference_base"] and 
                 trait_info["variant"] == mutation["query_base"]):
                 return {
@@ -286,8 +750,10 @@ class MutationAnalyzer:
                     "alignment_context": mutation["context"]
                 }
         
-        # Check against all known SNPs
-        for snp in self.snps_db["snps"]:
+        # Check against the known SNPs at this position
+        chromosome = trait_info.get("chromosome") if trait_info else None
+        for row in self.snp_positions.at(chromosome, original_pos).tolist():
+            snp = self.snps_db["snps"][row]
             if (snp["gene"] == gene and 
                 snp["position"] == original_pos and 
                 snp["reference"] == mutation["reference_base"] and 
@@ -0,0 +1,143 @@
+"""
+Memory-mapped access to reference genome FASTA files.
+"""
+
+import os
+import mmap
+import logging
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+# One line of a samtools-style .fai index: sequence name, number of bases, byte
+# offset of the first base, bases per line and bytes per line (with the newline)
+FaiRecord = namedtuple('FaiRecord', 'name length offset line_bases line_width')
+
+
+def read_fai(fai_path):
+    """Parse a .fai index into {sequence name: FaiRecord}."""
+    records = {}
+    with open(fai_path, 'r') as f:
+        for line in f:
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) < 5:
+                continue
+            name, length, offset, line_bases, line_width = fields[:5]
+            records[name] = FaiRecord(name, int(length), int(offset), int(line_bases), int(line_width))
+    return records
+
+
+def build_fai(fasta_path):
+    """
+    Index a FASTA file in one streaming pass (the file is never held in memory).
+
+    Every sequence must use one line length, except for its last line, as
+    samtools faidx requires; otherwise a ValueError is raised.
+    """
+    records = {}
+    name = None
+    offset = length = line_bases = line_width = 0
+    short_line = False  # a line shorter than line_bases was seen: it must be the last
+    position = 0
+    with open(fasta_path, 'rb') as f:
+        for line in f:
+            line_start, position = position, position + len(line)
+            if line.startswith(b'>'):
+                if name is not None:
+                    records[name] = FaiRecord(name, length, offset, line_bases, line_width)
+                name = line[1:].split(None, 1)[0].decode('ascii') if line[1:].strip() else ''
+                offset, length, line_bases, line_width, short_line = position, 0, 0, 0, False
+                continue
+            bases = len(line.rstrip(b'\r\n'))
+            if name is None or bases == 0:
+                continue
+            if line_bases == 0:
+                line_bases, line_width = bases, len(line)
+            elif short_line or bases > line_bases:
+                raise ValueError(f"Different line length in sequence '{name}' at byte {line_start} of {fasta_path}")
+            short_line = bases < line_bases
+            length += bases
+    if name is not None:
+        records[name] = FaiRecord(name, length, offset, line_bases, line_width)
+    return records
+
+
+def write_fai(fai_path, records):
+    with open(fai_path, 'w') as f:
+        for record in records.values():
+            f.write('\t'.join(str(field) for field in record) + '\n')
+
+
+class ReferenceGenome:
+    """
+    Read-only reference genome backed by a memory-mapped FASTA file.
+
+    Sequence offsets come from the .fai index next to the file (built and saved
+    on first use if missing), so fetching a region reads only that region's
+    bytes, in O(region) time, however large the file is.
+    """
+
+    def __init__(self, fasta_path, fai_path=None):
+        self.fasta_path = str(fasta_path)
+        fai_path = fai_path or self.fasta_path + '.fai'
+        if os.path.exists(fai_path):
+            self.records = read_fai(fai_path)
+        else:
+            logger.info(f"No FASTA index at {fai_path}, indexing {self.fasta_path}")
+            self.records = build_fai(self.fasta_path)
+            try:
+                write_fai(fai_path, self.records)
+            except OSError as e:
+                logger.warning(f"Could not save FASTA index to {fai_path}: {str(e)}")
+        self._file = open(self.fasta_path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        logger.info(f"Opened reference genome {self.fasta_path} ({len(self.records)} sequences)")
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __contains__(self, name):
+        return name in self.records
+
+    def resolve(self, chromosome):
+        """
+        Name of the sequence holding `chromosome`, accepting both '11' and
+        'chr11' naming; None if the genome has no such sequence.
+        """
+        chromosome = str(chromosome)
+        bare = chromosome[3:] if chromosome.lower().startswith('chr') else chromosome
+        for name in (chromosome, bare, 'chr' + bare):
+            if name in self.records:
+                return name
+        return None
+
+    def _byte(self, record, position):
+        """File offset of 0-based `position` of a sequence."""
+        return record.offset + (position // record.line_bases) * record.line_width + position % record.line_bases
+
+    def fetch(self, name, start, end):
+        """
+        Bases start..end (1-based, inclusive, as in samtools faidx) of sequence
+        `name`, clipped to the sequence. Returns '' for an empty range.
+        """
+        record = self.records[name]
+        start, end = max(start, 1), min(end, record.length)
+        if start > end:
+            return ''
+        raw = self._map[self._byte(record, start - 1):self._byte(record, end - 1) + 1]
+        return raw.translate(None, b'\r\n').decode('ascii')
+
+    def fetch_region(self, region):
+        """Fetch a 'name:start-end' region (or a whole 'name')."""
+        name, _, span = region.rpartition(':')
+        if not name or '-' not in span:
+            return self.fetch(region, 1, self.records[region].length)
+        start, end = span.replace(',', '').split('-', 1)
+        return self.fetch(name, int(start), int(end))
@@ -0,0 +1,586 @@
+"""
+Locating reference regions inside long uploaded sequences.
+"""
+
+import os
+import atexit
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from alignment import _encode
+
+# Worker processes for scans of long sequences (1 scans in the calling process)
+SCAN_WORKERS = int(os.getenv("SCAN_WORKERS", "1"))
+
+# Sequences shorter than this are always scanned in the calling process
+PARALLEL_SCAN_MIN_LENGTH = 4_000_000
+
+# Content-defined chunking: a cut follows a 16-base window whose hash has its top
+# CHUNK_AVERAGE_BITS bits zero, i.e. on average every 2**CHUNK_AVERAGE_BITS bases,
+# with chunk lengths kept between CHUNK_MIN and CHUNK_MAX
+CHUNK_AVERAGE_BITS = 16
+CHUNK_MIN = 1 << 14
+CHUNK_MAX = 1 << 18
+
+# Upper bound on the memory of cached per-chunk seed hits (0 disables the cache)
+CHUNK_CACHE_BYTES = int(os.getenv("CHUNK_CACHE_BYTES", str(64 << 20)))
+
+# Number of text positions each lane of the bit-parallel scanner covers
+LANE_LENGTH = 256
+
+_ONES = np.uint64(0xFFFFFFFFFFFFFFFF)
+_ONE = np.uint64(1)
+_TOP = np.uint64(63)
+
+
+def _pattern_masks(pattern_codes, words):
+    """Per-symbol match bit masks (Peq), one row of `words` uint64 per distinct pattern symbol."""
+    symbols = np.unique(pattern_codes)
+    masks = np.zeros((len(symbols) + 1, words), dtype=np.uint64)  # last row: symbols not in pattern
+    for position, code in enumerate(pattern_codes):
+        row = np.searchsorted(symbols, code)
+        masks[row, position // 64] |= np.uint64(1 << (position % 64))
+    return symbols, masks
+
+
+def _text_rows(text_codes, symbols):
+    """Map each text symbol to its row in the Peq table."""
+    if text_codes.dtype == np.uint8:
+        table = np.full(256, len(symbols), dtype=np.intp)
+        table[symbols] = np.arange(len(symbols))
+        return table[text_codes]
+    rows = np.searchsorted(symbols, text_codes)
+    rows = np.minimum(rows, len(symbols) - 1)
+    rows[symbols[rows] != text_codes] = len(symbols)
+    return rows
+
+
+def _add(a, b):
+    """Multi-word addition (little-endian list of uint64 arrays) with carry propagation."""
+    out = []
+    carry = None
+    for x, y in zip(a, b):
+        total = x + y
+        next_carry = total < x
+        if carry is not None:
+            total = total + carry
+            next_carry |= total < carry
+        out.append(total)
+        carry = next_carry.astype(np.uint64)
+    return out
+
+
+def _shift_left(a):
+    """Multi-word left shift by one bit, inserting zero."""
+    out = [a[0] << _ONE]
+    for low, high in zip(a, a[1:]):
+        out.append((high << _ONE) | (low >> _TOP))
+    return out
+
+
+def find_approximate(sequence: str, pattern: str, max_edits: int, workers: int = None):
+    """
+    Report every position where `pattern` occurs in `sequence` with at most
+    `max_edits` edits (substitutions, insertions, deletions).
+
+    `sequence` may also be an array of character codes (see alignment._encode).
+    With more than one worker, long sequences are scanned by chunk_scan.
+
+    Myers' bit-vector algorithm: the DP column for the whole pattern is kept
+    as bit masks and advanced one text base per step. The text is cut into
+    lanes of LANE_LENGTH positions that are scanned side by side as NumPy
+    uint64 words; each lane after the first starts len(pattern) + max_edits
+    bases early, the longest text an occurrence within max_edits can span,
+    so every reported distance is exact.
+
+    Returns:
+        (ends, distances): int64 arrays of occurrence end positions (exclusive)
+        in `sequence` and their edit distances, sorted by end position.
+    """
+    m, n = len(pattern), len(sequence)
+    if m == 0 or n == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    if _parallel(sequence, workers):
+        # An occurrence ending in a chunk starts at most m + max_edits bases before it
+        return chunk_scan(sequence, 'approximate', (pattern, max_edits), m + max_edits, workers)
+
+    words = (m + 63) // 64
+    symbols, masks = _pattern_masks(_encode(pattern), words)
+    rows = _text_rows(sequence if isinstance(sequence, np.ndarray) else _encode(sequence), symbols)
+
+    warmup = m + max_edits
+    steps = warmup + LANE_LENGTH
+    lanes = max(1, (n - warmup + LANE_LENGTH - 1) // LANE_LENGTH)
+    # Lane k scans text[k * LANE_LENGTH:][:steps]; lane 0 owns all its positions,
+    # the others only those after the warm-up. Positions past the end match nothing.
+    positions = np.arange(steps)[:, None] + np.arange(lanes)[None, :] * LANE_LENGTH
+    step_rows = np.where(positions < n, rows[np.minimum(positions, n - 1)], len(symbols))
+    word_masks = [np.ascontiguousarray(masks[:, w]) for w in range(words)]
+
+    high_word, high_shift = (m - 1) // 64, np.uint64((m - 1) % 64)
+    top_mask = np.uint64((1 << (m - 64 * high_word)) - 1)
+    pv = [np.full(lanes, _ONES, dtype=np.uint64) for _ in range(words)]
+    pv[-1] &= top_mask
+    mv = [np.zeros(lanes, dtype=np.uint64) for _ in range(words)]
+    score = np.full(lanes, m, dtype=np.uint64)
+    distances = np.empty((steps, lanes), dtype=np.uint64)
+
+    for step in range(steps):
+        eq = [word_mask[step_rows[step]] for word_mask in word_masks]
+        xv = [e | v for e, v in zip(eq, mv)]
+        xh = [(s ^ p) | e for s, p, e in zip(_add([e & p for e, p in zip(eq, pv)], pv), pv, eq)]
+        ph = [v | ~(h | p) for v, h, p in zip(mv, xh, pv)]
+        mh = [p & h for p, h in zip(pv, xh)]
+        score += (ph[high_word] >> high_shift) & _ONE
+        score -= (mh[high_word] >> high_shift) & _ONE
+        ph, mh = _shift_left(ph), _shift_left(mh)
+        pv = [h | ~(x | p) for h, x, p in zip(mh, xv, ph)]
+        mv = [p & x for p, x in zip(ph, xv)]
+        pv[-1] &= top_mask
+        mv[-1] &= top_mask
+        distances[step] = score
+
+    owned = np.concatenate([distances[:warmup, 0], distances[warmup:].T.ravel()])[:n].astype(np.int64)
+    ends = np.flatnonzero(owned <= max_edits)
+    return ends + 1, owned[ends]
+
+
+# k-mer length of the seed index (4**SEED_LENGTH lookup-table entries)
+SEED_LENGTH = 11
+
+# Seeds whose diagonals (text position - reference offset) differ by at most this
+# much vote for the same candidate, so a few indels do not split the votes
+DIAGONAL_DRIFT = 8
+
+# Text positions processed per block by KmerIndex.candidates
+SEED_BLOCK = 1 << 22
+
+_BASE_CODES = np.full(256, 4, dtype=np.uint8)
+for _code, _base in enumerate(b'ACGT'):
+    _BASE_CODES[_base] = _code
+    _BASE_CODES[_base + 32] = _code  # lowercase
+
+def _character_codes(text):
+    return text if isinstance(text, np.ndarray) else _encode(text)
+
+
+_COMPLEMENT = str.maketrans('ACGTNacgtn', 'TGCANtgcan')
+
+
+def reverse_complement(sequence):
+    """Reverse complement of a DNA sequence (case preserved, other symbols kept as is)."""
+    return sequence.translate(_COMPLEMENT)[::-1]
+
+
+def _kmer_codes(codes, k):
+    """
+    2-bit packed codes of every k-mer of a base-code array, and whether each
+    k-mer is free of non-ACGT symbols.
+    """
+    count = len(codes) - k + 1
+    if count <= 0:
+        return np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=bool)
+    kmers = np.zeros(count, dtype=np.uint32)
+    for j in range(k):
+        kmers <<= 2
+        kmers |= codes[j:j + count] & 3
+    invalid = np.concatenate(([0], np.cumsum(codes > 3)))
+    return kmers, invalid[k:] - invalid[:count] == 0
+
+
+class KmerIndex:
+    """
+    Seed index over a panel of reference sequences.
+
+    Every k-mer of every reference is stored with its (reference, offset). A
+    scan of an uploaded sequence looks each of its k-mers up in a dense table
+    and lets every seed hit vote for the diagonal (text position - offset) it
+    implies, i.e. for where that reference would start in the upload. Votes on
+    nearby diagonals are merged, so the ranking tolerates substitutions and
+    small indels anywhere in the reference.
+
+    With both_strands, the reverse complement of every reference is indexed
+    too, so one scan of the upload also finds minus-strand copies.
+    """
+
+    def __init__(self, references, k=SEED_LENGTH, both_strands=False):
+        self.k = k
+        self.names = list(references)
+        self.both_strands = both_strands
+        # Reference id r < len(names) is the forward strand, r + len(names) the reverse complement
+        strands = [references[name] for name in self.names]
+        if both_strands:
+            strands += [reverse_complement(sequence) for sequence in strands]
+        # All strands are encoded in one pass, separated by an 'N' so that no
+        # valid k-mer spans two of them
+        lengths = np.array([len(sequence) + 1 for sequence in strands], dtype=np.int64)
+        starts = np.cumsum(lengths) - lengths
+        kmers, valid = _kmer_codes(_BASE_CODES[_encode('N'.join(strands)) & 0xFF], k)
+        positions = np.flatnonzero(valid)
+        kmer_refs = np.repeat(np.arange(len(strands)), lengths)[positions]
+        kmer_codes = kmers[positions]
+        shift = max(len(positions).bit_length(), 1)
+        if 2 * k + shift <= 64:
+            # Stable order by k-mer: one sort of the codes packed above their indexes
+            packed = np.sort((kmer_codes.astype(np.uint64) << np.uint64(shift)) | np.arange(len(positions), dtype=np.uint64))
+            order = (packed & np.uint64((1 << shift) - 1)).astype(np.int64)
+        else:
+            order = np.argsort(kmer_codes, kind='stable')
+        kmer_codes = kmer_codes[order]
+        # Postings: (reference, offset) pairs grouped by k-mer
+        self._post_ref = kmer_refs[order].astype(np.int64)
+        self._post_offset = (positions - starts[kmer_refs])[order].astype(np.int64)
+        # The codes are sorted: each distinct k-mer starts where the code changes
+        first = np.flatnonzero(np.concatenate(([True], kmer_codes[1:] != kmer_codes[:-1]))) if len(kmer_codes) else np.zeros(0, np.int64)
+        unique = kmer_codes[first]
+        self._kmers = unique
+        self._post_start = first
+        self._post_count = np.diff(np.append(first, len(kmer_codes)))
+        self._table = np.full(4 ** k, -1, dtype=np.int32)
+        self._table[unique] = np.arange(len(unique), dtype=np.int32)
+
+    def _seed_hits(self, sequence, start=0, stop=None):
+        """
+        (reference id, diagonal) of every seed hit in `sequence` (a string or an
+        array of character codes), block by block. Only k-mers starting in
+        [start, stop) are looked up.
+        """
+        kmer_count = max(len(sequence) - self.k + 1, 0)
+        stop = kmer_count if stop is None else min(stop, kmer_count)
+        refs, diagonals = [], []
+        for block_start in range(start, stop, SEED_BLOCK):
+            block = sequence[block_start:min(block_start + SEED_BLOCK, stop) + self.k - 1]
+            kmers, valid = _kmer_codes(_BASE_CODES[_character_codes(block) & 0xFF], self.k)
+            slots = self._table[kmers]
+            hits = np.flatnonzero((slots >= 0) & valid)
+            if len(hits) == 0:
+                continue
+            block_refs, block_diagonals = self._expand_hits(slots[hits], hits + block_start)
+            refs.append(block_refs)
+            diagonals.append(block_diagonals)
+        if not refs:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        return np.concatenate(refs), np.concatenate(diagonals)
+
+    def _expand_hits(self, slots, positions):
+        """
+        Expand seed hits (k-mer slot, text position) into every posting they
+        match: (reference id, diagonal) arrays.
+        """
+        counts = self._post_count[slots]
+        total = int(counts.sum())
+        firsts = np.repeat(self._post_start[slots] - (np.cumsum(counts) - counts), counts)
+        entries = firsts + np.arange(total)
+        return self._post_ref[entries], np.repeat(positions, counts) - self._post_offset[entries]
+
+    def _indexed_seed_hits(self, text_index):
+        """
+        The seed hits of _seed_hits, looked up in an index of the sequence (an
+        fm_index.FMIndex) instead of scanning it: one exact search per indexed k-mer.
+        """
+        shifts = 2 * np.arange(self.k - 1, -1, -1, dtype=np.uint32)
+        symbols = ((self._kmers[:, None] >> shifts) & 3).astype(np.uint8) + 1  # FMIndex codes A C G T = 1-4
+        slots, positions = text_index.locate_many(symbols)
+        return self._expand_hits(slots, positions)
+
+    def candidates(self, sequence, limit=5, text_index=None, workers=None):
+        """
+        Rank candidate placements of every reference in `sequence`.
+
+        With `text_index`, an FM-index of the sequence built earlier, the seed
+        hits are looked up in it instead of scanning the sequence again. With
+        more than one worker, long sequences are scanned by chunk_scan.
+
+        Returns {reference name: [{'start': int, 'votes': int, 'strand': str}, ...]}
+        with up to `limit` candidates per reference that has any seed hit, best
+        first. 'start' is where the reference (its reverse complement if 'strand'
+        is '-') begins in `sequence`; it can be negative when the upload starts
+        inside the reference. 'votes' is the number of seed hits supporting it.
+        """
+        if text_index is not None:
+            refs, diagonals = self._indexed_seed_hits(text_index)
+        elif _parallel(sequence, workers):
+            # Chunks own the k-mers starting in them and read k - 1 bases past their end
+            refs, diagonals = chunk_scan(sequence, 'seeds', self, 0, workers)
+        else:
+            refs, diagonals = self._seed_hits(sequence)
+        return self._rank(refs, diagonals, limit)
+
+    def _rank(self, refs, diagonals, limit):
+        """Vote seed hits (reference ids, diagonals) into ranked candidates; see candidates."""
+        if len(refs) == 0:
+            return {}
+        order = np.lexsort((diagonals, refs))
+        refs, diagonals = refs[order], diagonals[order]
+
+        # Votes per exact diagonal
+        new_diagonal = np.ones(len(refs), dtype=bool)
+        new_diagonal[1:] = (refs[1:] != refs[:-1]) | (diagonals[1:] != diagonals[:-1])
+        firsts = np.flatnonzero(new_diagonal)
+        refs, diagonals = refs[firsts], diagonals[firsts]
+        votes = np.diff(np.append(firsts, len(new_diagonal)))
+
+        # Merge nearby diagonals of the same reference into one candidate
+        new_cluster = np.ones(len(refs), dtype=bool)
+        new_cluster[1:] = (refs[1:] != refs[:-1]) | (diagonals[1:] - diagonals[:-1] > DIAGONAL_DRIFT)
+        cluster = np.cumsum(new_cluster) - 1
+        cluster_votes = np.bincount(cluster, weights=votes).astype(np.int64)
+        # Each cluster starts at its best-supported diagonal
+        best = np.lexsort((-votes, cluster))
+        best = best[np.concatenate(([True], cluster[best][1:] != cluster[best][:-1]))]
+
+        # Both strands of a reference compete for its candidate slots
+        names = refs[best] % len(self.names)
+        ranked = np.lexsort((refs[best], diagonals[best], -cluster_votes, names))
+        result = {}
+        for row in best[ranked]:
+            name = self.names[refs[row] % len(self.names)]
+            entries = result.setdefault(name, [])
+            if len(entries) < limit:
+                entries.append({'start': int(diagonals[row]), 'votes': int(cluster_votes[cluster[row]]),
+                                'strand': '-' if refs[row] >= len(self.names) else '+'})
+        return result
+
+
+# Transform length of the blocked FFT scan in ungapped_matches (small blocks stay in cache)
+FFT_BLOCK = 1 << 14
+
+
+def ungapped_matches(sequence, pattern):
+    """
+    Number of matching bases between `pattern` and every same-length window of
+    `sequence`, without gaps.
+
+    One cross-correlation per nucleotide of the one-hot encoded texts, summed
+    in the frequency domain, gives the exact match count at every offset in
+    O(n log n). Long sequences are processed in overlapping blocks of FFT_BLOCK
+    positions. Only A, C, G and T (any case) can match.
+
+    Returns:
+        int64 array; element i is the match count of sequence[i:i + len(pattern)]
+        (empty if the pattern is longer than the sequence).
+    """
+    m, n = len(pattern), len(sequence)
+    if m == 0 or n < m:
+        return np.zeros(0, dtype=np.int64)
+    text = _BASE_CODES[_encode(sequence) & 0xFF]
+    codes = _BASE_CODES[_encode(pattern) & 0xFF]
+    size = 1 << (max(min(n, FFT_BLOCK), 2 * m) - 1).bit_length()
+    # Conjugated pattern spectra turn the transform product into a correlation
+    spectra = [np.conj(np.fft.rfft(codes == base, size)) for base in range(4)]
+
+    offsets = n - m + 1
+    step = size - m + 1  # offsets whose window lies inside one block
+    counts = np.empty(offsets, dtype=np.int64)
+    for start in range(0, offsets, step):
+        block = text[start:start + size]
+        spectrum = sum(np.fft.rfft(block == base, size) * spectra[base] for base in range(4))
+        stop = min(step, offsets - start)
+        counts[start:start + stop] = np.rint(np.fft.irfft(spectrum, size)[:stop])
+    return counts
+
+
+_pools = {}  # workers -> (pool, seed index its processes hold)
+_worker_index = None
+
+
+def _parallel(sequence, workers):
+    workers = SCAN_WORKERS if workers is None else workers
+    return workers > 1 and len(sequence) >= PARALLEL_SCAN_MIN_LENGTH and isinstance(sequence, str) and sequence.isascii()
+
+
+def _init_worker(index):
+    global _worker_index
+    _worker_index = index
+
+
+def _pool(workers, index=None):
+    """
+    Process pool of `workers` processes, kept for reuse. A seed index is sent to
+    each process once, when the pool starts; a pool holding another index is replaced.
+    """
+    pool, pool_index = _pools.get(workers, (None, None))
+    if pool is None or (index is not None and pool_index is not index):
+        if pool is not None:
+            pool.shutdown()
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(index,))
+        _pools[workers] = (pool, index)
+    return pool
+
+
+@atexit.register
+def _shutdown_pools():
+    for pool, _ in _pools.values():
+        pool.shutdown(cancel_futures=True)
+    _pools.clear()
+
+
+def _scan_chunk(shared_name, length, kind, argument, read_start, start, stop):
+    """
+    Worker side of chunk_scan: attach to the shared sequence and scan
+    text[read_start:stop], reporting only hits owned by the chunk [start, stop).
+    """
+    segment = shared_memory.SharedMemory(name=shared_name)
+    text = np.ndarray((length,), dtype=np.uint8, buffer=segment.buf)
+    try:
+        if kind == 'seeds':
+            # k-mers starting in [start, stop); the index reads k - 1 bases further
+            return _worker_index._seed_hits(text, start, stop)
+        pattern, max_edits = argument
+        ends, distances = find_approximate(text[read_start:stop], pattern, max_edits, workers=1)
+        ends += read_start
+        owned = ends > start
+        return ends[owned], distances[owned]
+    finally:
+        del text
+        segment.close()
+
+
+def chunk_scan(sequence, kind, argument, overlap, workers=None, chunks=None):
+    """
+    Scan a long sequence in chunks across a process pool.
+
+    The sequence is copied once into shared memory; workers attach to it by
+    name instead of receiving pickled copies. Each chunk owns the hits in its
+    range and reads `overlap` bases before it, enough for any hit it owns (for
+    'approximate' scans: pattern length + max edits). Results are concatenated
+    in chunk order, exactly as a single scan returns them.
+
+    kind 'seeds': argument is a KmerIndex; returns its seed hits (reference ids, diagonals).
+    kind 'approximate': argument is (pattern, max_edits); returns find_approximate's (ends, distances).
+    """
+    workers = SCAN_WORKERS if workers is None else workers
+    length = len(sequence)
+    bounds = np.linspace(0, length, (chunks or workers * 4) + 1).astype(np.int64).tolist()
+    pool = _pool(workers, argument if kind == 'seeds' else None)
+    segment = shared_memory.SharedMemory(create=True, size=max(length, 1))
+    try:
+        segment.buf[:length] = sequence.encode('ascii')
+        futures = [pool.submit(_scan_chunk, segment.name, length, kind, None if kind == 'seeds' else argument,
+                               max(0, start - overlap), start, stop)
+                   for start, stop in zip(bounds[:-1], bounds[1:])]
+        results = [future.result() for future in futures]
+    finally:
+        segment.close()
+        segment.unlink()
+    return tuple(np.concatenate(column) for column in zip(*results))
+
+
+# Bases hashed per cut decision, and the odd multiplier that mixes their packed code
+_CHUNK_WINDOW = 16
+_CHUNK_MULTIPLIER = np.uint32(0x9E3779B1)
+
+
+def content_chunks(sequence, average_bits=CHUNK_AVERAGE_BITS, minimum=CHUNK_MIN, maximum=CHUNK_MAX):
+    """
+    Content-defined chunk boundaries of a sequence: [0, cut, ..., len(sequence)].
+
+    A cut follows every _CHUNK_WINDOW bases whose packed 2-bit code, multiplied
+    by an odd constant, has its top `average_bits` bits zero. The code of every
+    window is built in log2(_CHUNK_WINDOW) vectorized steps. An edit can only
+    move cuts within _CHUNK_WINDOW bases of it, so chunks away from the edit keep
+    their content (and their cache entries) even when indels shift them.
+    """
+    n = len(sequence)
+    if n < _CHUNK_WINDOW:
+        return [0, n] if n else [0]  # no full window to hash: a single chunk
+    # A C G T -> 0 1 3 2 (other symbols share these codes; only the cuts depend on them)
+    windows = (_character_codes(sequence).astype(np.uint32) >> 1) & 3
+    width = 1
+    while width < _CHUNK_WINDOW:
+        windows = (windows[:len(windows) - width] << np.uint32(2 * width)) | windows[width:]
+        width *= 2
+    hashes = (windows * _CHUNK_MULTIPLIER) >> np.uint32(32 - average_bits)
+    boundaries = [0]
+    for cut in (np.flatnonzero(hashes == 0) + _CHUNK_WINDOW).tolist():
+        while cut - boundaries[-1] > maximum:
+            boundaries.append(boundaries[-1] + maximum)
+        if cut - boundaries[-1] >= minimum:
+            boundaries.append(cut)
+    while n - boundaries[-1] > maximum:
+        boundaries.append(boundaries[-1] + maximum)
+    if boundaries[-1] < n:
+        boundaries.append(n)
+    return boundaries
+
+
+class ChunkSeedCache:
+    """
+    Byte-bounded LRU of seed hits per content-defined chunk.
+
+    Each chunk's hits are stored relative to the chunk start under a hash of its
+    content (plus the k - 1 bases its last k-mers read past the end), so a
+    re-upload with a few edited bases rescans only the chunks around the edits,
+    even when indels shift everything after them.
+    """
+
+    def __init__(self, max_bytes=None):
+        self.max_bytes = CHUNK_CACHE_BYTES if max_bytes is None else max_bytes
+        self._entries = OrderedDict()  # digest -> (refs, diagonals - chunk start)
+        self._bytes = 0
+        self._index = None
+        self._lock = threading.Lock()
+
+    def candidates(self, index, sequence, limit=5):
+        """
+        KmerIndex.candidates of `sequence`, reusing cached chunks. Returns the
+        candidates and a report: chunks, reused_chunks, reused_bases, scanned_bases.
+        """
+        with self._lock:
+            if index is not self._index:
+                # Hits of another seed index (e.g. before a database reload) are stale
+                self._entries.clear()
+                self._bytes = 0
+                self._index = index
+        boundaries = content_chunks(sequence)
+        refs, diagonals = [], []
+        reused_chunks = reused_bases = 0
+        for start, stop in zip(boundaries[:-1], boundaries[1:]):
+            content = sequence[start:stop + index.k - 1]
+            key = hashlib.blake2b(content.encode('utf-8') if isinstance(content, str) else content.tobytes(),
+                                  digest_size=16).digest()
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+            if entry is None:
+                chunk_refs, chunk_diagonals = index._seed_hits(sequence, start, stop)
+                self._put(key, (chunk_refs, chunk_diagonals - start))
+            else:
+                chunk_refs, chunk_diagonals = entry[0], entry[1] + start
+                reused_chunks += 1
+                reused_bases += stop - start
+            refs.append(chunk_refs)
+            diagonals.append(chunk_diagonals)
+        report = {
+            "chunks": len(boundaries) - 1,
+            "reused_chunks": reused_chunks,
+            "reused_bases": reused_bases,
+            "scanned_bases": len(sequence) - reused_bases
+        }
+        if not refs:
+            return {}, report
+        return index._rank(np.concatenate(refs), np.concatenate(diagonals), limit), report
+
+    def _put(self, key, entry):
+        size = entry[0].nbytes + entry[1].nbytes + len(key)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[0].nbytes + previous[1].nbytes + len(key)
+            self._entries[key] = entry
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                evicted_key, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted[0].nbytes + evicted[1].nbytes + len(evicted_key)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes}
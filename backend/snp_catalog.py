@@ -0,0 +1,317 @@
+"""
+Compact, memory-mapped SNP catalog.
+
+A catalog file holds the SNP database in columns: a fixed-width record per SNP
+(integer positions and 32-bit ids of its string fields) and one deduplicated
+string heap addressed through an offset table. Opening a catalog maps the file
+without reading it, so startup time and resident memory do not grow with the
+number of SNPs; a text field is decoded only when it is accessed.
+
+Build a catalog from the JSON database (or a TSV with one column per field):
+
+    python snp_catalog.py data/snps_db.json data/snps_db.bin
+"""
+
+import os
+import csv
+import sys
+import json
+import mmap
+import struct
+import logging
+from collections.abc import Mapping, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'SNPCAT01'
+
+# magic, number of records, number of strings, string id of the JSON metadata
+_HEADER = struct.Struct('<8sQQQ')
+
+INTEGER_FIELDS = ('position', 'position_start', 'position_end')
+STRING_FIELDS = ('gene', 'chromosome', 'reference', 'variant', 'rsid', 'trait',
+                 'effect', 'description', 'reference_sequence')
+FIELDS = INTEGER_FIELDS + STRING_FIELDS
+
+RECORD_DTYPE = np.dtype([(field, '<i8') for field in INTEGER_FIELDS] +
+                        [(field, '<u4') for field in STRING_FIELDS])
+
+# Stored for fields an entry does not have; such fields are left out of the entry
+MISSING_INTEGER = np.iinfo(np.int64).min
+MISSING_STRING = np.iinfo(np.uint32).max
+
+
+def _aligned(offset, alignment=8):
+    return (offset + alignment - 1) // alignment * alignment
+
+
+def load_source(source_path):
+    """
+    Read SNP entries from a snps_db.json-style file ({"snps": [...], "metadata": ...})
+    or a TSV whose header names the fields. Returns (entries, metadata).
+    """
+    source_path = str(source_path)
+    if source_path.endswith(('.tsv', '.txt')):
+        with open(source_path, 'r', newline='') as f:
+            entries = []
+            for row in csv.DictReader(f, delimiter='\t'):
+                entry = {field: value for field, value in row.items() if field and value not in (None, '')}
+                for field in INTEGER_FIELDS:
+                    if field in entry:
+                        entry[field] = int(entry[field])
+                entries.append(entry)
+        return entries, {}
+    with open(source_path, 'r') as f:
+        data = json.load(f)
+    return data['snps'], data.get('metadata', {})
+
+
+def build_catalog(source_path, catalog_path):
+    """
+    Compile a JSON or TSV SNP database into a catalog file. The file is written
+    next to its destination and renamed into place, so readers never map a
+    partially written catalog. Returns the number of SNPs.
+    """
+    entries, metadata = load_source(source_path)
+    ignored = sorted({field for entry in entries for field in entry} - set(FIELDS))
+    if ignored:
+        logger.warning(f"Fields not stored in the SNP catalog: {', '.join(ignored)}")
+
+    string_ids = {}
+    strings = []
+
+    def intern(value):
+        if value not in string_ids:
+            string_ids[value] = len(strings)
+            strings.append(value.encode('utf-8'))
+        return string_ids[value]
+
+    records = np.zeros(len(entries), dtype=RECORD_DTYPE)
+    for field in INTEGER_FIELDS:
+        records[field] = [int(entry[field]) if field in entry else MISSING_INTEGER for entry in entries]
+    for field in STRING_FIELDS:
+        records[field] = [intern(str(entry[field])) if field in entry else MISSING_STRING for entry in entries]
+    metadata_id = intern(json.dumps(metadata))
+    offsets = np.concatenate(([0], np.cumsum([len(value) for value in strings], dtype=np.uint64))).astype('<u8')
+
+    records_offset = _HEADER.size
+    offsets_offset = _aligned(records_offset + records.nbytes)
+    heap_offset = offsets_offset + offsets.nbytes
+    temporary_path = f"{catalog_path}.tmp{os.getpid()}"
+    with open(temporary_path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, len(records), len(strings), metadata_id))
+        f.write(records.tobytes())
+        f.write(b'\0' * (offsets_offset - records_offset - records.nbytes))
+        f.write(offsets.tobytes())
+        for value in strings:
+            f.write(value)
+    os.replace(temporary_path, catalog_path)
+    logger.info(f"Built SNP catalog {catalog_path}: {len(records)} SNPs, {len(strings)} distinct strings, {heap_offset + int(offsets[-1])} bytes")
+    return len(records)
+
+
+class CatalogEntry(Mapping):
+    """
+    One SNP of a catalog, read-only and dict-like. Fields are decoded from the
+    mapped file on every access; dict(entry) materializes all of them.
+    """
+
+    __slots__ = ('_catalog', '_row')
+
+    def __init__(self, catalog, row):
+        self._catalog = catalog
+        self._row = row
+
+    def __getitem__(self, field):
+        value = self._catalog._field(self._row, field)
+        if value is None:
+            raise KeyError(field)
+        return value
+
+    def __iter__(self):
+        return (field for field in FIELDS if self._catalog._field(self._row, field) is not None)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"CatalogEntry({self.get('rsid')}, {self.get('gene')}, {self.get('trait')})"
+
+
+class SnpCatalog(Sequence):
+    """
+    SNP database mapped from a catalog file built by build_catalog.
+
+    Indexing and iteration give CatalogEntry objects, so a catalog can stand in
+    for the list of SNP dicts of snps_db.json. column() exposes a field of every
+    SNP at once as a read-only array view, for vectorized lookups.
+    """
+
+    def __init__(self, catalog_path):
+        self.catalog_path = str(catalog_path)
+        with open(self.catalog_path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < _HEADER.size:
+            raise ValueError(f"{self.catalog_path} is not an SNP catalog")
+        magic, count, string_count, self._metadata_id = _HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            raise ValueError(f"{self.catalog_path} is not an SNP catalog (or was built by another version)")
+        offsets_offset = _aligned(_HEADER.size + count * RECORD_DTYPE.itemsize)
+        self._records = np.frombuffer(self._map, dtype=RECORD_DTYPE, count=count, offset=_HEADER.size)
+        self._offsets = np.frombuffer(self._map, dtype='<u8', count=string_count + 1, offset=offsets_offset)
+        self._heap_offset = offsets_offset + self._offsets.nbytes
+
+    def __len__(self):
+        return len(self._records)
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [CatalogEntry(self, index) for index in range(*row.indices(len(self)))]
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError("SNP catalog index out of range")
+        return CatalogEntry(self, row)
+
+    def __iter__(self):
+        return (CatalogEntry(self, row) for row in range(len(self)))
+
+    def string(self, string_id):
+        """Decode one string of the heap."""
+        start = self._heap_offset + int(self._offsets[string_id])
+        end = self._heap_offset + int(self._offsets[string_id + 1])
+        return self._map[start:end].decode('utf-8')
+
+    def _field(self, row, field):
+        """Value of a field of one SNP; None if the field is unknown or missing."""
+        if field not in RECORD_DTYPE.fields:
+            return None
+        value = self._records[field][row]
+        if field in INTEGER_FIELDS:
+            return None if value == MISSING_INTEGER else int(value)
+        return None if value == MISSING_STRING else self.string(int(value))
+
+    def column(self, field):
+        """
+        A field of every SNP: int64 positions (MISSING_INTEGER where absent), or
+        uint32 string ids (MISSING_STRING where absent) to pass to string().
+        """
+        return self._records[field]
+
+    @property
+    def metadata(self):
+        return json.loads(self.string(self._metadata_id))
+
+    @property
+    def nbytes(self):
+        return len(self._map)
+
+
+def field_values(snps, field, rows=None):
+    """
+    One field of the given rows (all SNPs by default) of a SnpCatalog or a list
+    of SNP dicts, None where missing. A catalog's field is read from its column,
+    decoding each distinct string once.
+    """
+    rows = range(len(snps)) if rows is None else rows
+    if not isinstance(snps, SnpCatalog):
+        return [snps[row].get(field) for row in rows]
+    values = snps.column(field)[np.asarray(rows, dtype=np.int64)].tolist()
+    if field in INTEGER_FIELDS:
+        return [None if value == MISSING_INTEGER else value for value in values]
+    strings = {MISSING_STRING: None}
+    for string_id in set(values) - strings.keys():
+        strings[string_id] = snps.string(string_id)
+    return [strings[string_id] for string_id in values]
+
+
+def first_rows(snps, fields):
+    """
+    For every SNP, the row of the first SNP with the same values of `fields`.
+    A catalog is grouped on its columns without decoding any string (equal
+    strings share one id in its heap).
+    """
+    if isinstance(snps, SnpCatalog):
+        if not len(snps):
+            return np.zeros(0, dtype=np.int64)
+        keys = np.stack([snps.column(field).astype(np.int64) for field in fields], axis=1)
+        _, first, groups = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+        return first[groups.ravel()].astype(np.int64)
+    seen = {}
+    return np.array([seen.setdefault(tuple(snp.get(field) for field in fields), row) for row, snp in enumerate(snps)],
+                    dtype=np.int64)
+
+
+def normalize_chromosome(chromosome):
+    """'chr11', 'Chr11' and '11' all name chromosome '11'."""
+    chromosome = str(chromosome)
+    return chromosome[3:] if chromosome.lower().startswith('chr') else chromosome
+
+
+class PositionIndex:
+    """
+    Sorted-array index of SNPs by (chromosome, position).
+
+    Per chromosome, SNP positions are kept sorted with the row of each SNP in
+    the database, so all SNPs inside a genomic span are found with two binary
+    searches: O(log n + k) for k results. Works over a SnpCatalog (built from
+    its columns without decoding entries) or a list of SNP dicts.
+    """
+
+    def __init__(self, snps):
+        self._chromosomes = {}  # chromosome -> (sorted positions, rows)
+        if isinstance(snps, SnpCatalog):
+            positions = snps.column('position')
+            chromosome_ids = snps.column('chromosome')
+            rows = np.flatnonzero((positions != MISSING_INTEGER) & (chromosome_ids != MISSING_STRING))
+            grouped = {}
+            for string_id in np.unique(chromosome_ids[rows]).tolist():
+                grouped.setdefault(normalize_chromosome(snps.string(string_id)), []).append(rows[chromosome_ids[rows] == string_id])
+            grouped = {chromosome: np.concatenate(parts) for chromosome, parts in grouped.items()}
+        else:
+            positions = np.array([snp.get('position', MISSING_INTEGER) for snp in snps], dtype=np.int64)
+            grouped = {}
+            for row, snp in enumerate(snps):
+                if 'chromosome' in snp and 'position' in snp:
+                    grouped.setdefault(normalize_chromosome(snp['chromosome']), []).append(row)
+            grouped = {chromosome: np.array(rows, dtype=np.int64) for chromosome, rows in grouped.items()}
+        for chromosome, rows in grouped.items():
+            chromosome_positions = np.asarray(positions[rows], dtype=np.int64)
+            order = np.argsort(chromosome_positions, kind='stable')
+            self._chromosomes[chromosome] = (chromosome_positions[order], rows[order].astype(np.int64))
+
+    def __len__(self):
+        return sum(len(positions) for positions, _ in self._chromosomes.values())
+
+    def overlapping(self, chromosome, start, end):
+        """Rows of the SNPs at positions start..end (inclusive) of a chromosome, by position."""
+        entry = self._chromosomes.get(normalize_chromosome(chromosome))
+        if entry is None or start > end:
+            return np.zeros(0, dtype=np.int64)
+        positions, rows = entry
+        return rows[np.searchsorted(positions, start, 'left'):np.searchsorted(positions, end, 'right')]
+
+    def at(self, chromosome, position):
+        """Rows of the SNPs at one position; on every chromosome if `chromosome` is None."""
+        if chromosome is not None:
+            return self.overlapping(chromosome, position, position)
+        found = [self.overlapping(name, position, position) for name in self._chromosomes]
+        return np.concatenate(found) if found else np.zeros(0, dtype=np.int64)
+
+
+def main(argv):
+    if len(argv) not in (2, 3):
+        print(f"Usage: {argv[0]} SOURCE.json|SOURCE.tsv [CATALOG]", file=sys.stderr)
+        return 2
+    source_path = argv[1]
+    catalog_path = argv[2] if len(argv) == 3 else os.path.splitext(source_path)[0] + '.bin'
+    count = build_catalog(source_path, catalog_path)
+    print(f"Wrote {count} SNPs to {catalog_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main(sys.argv))